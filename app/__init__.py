@@ -31,8 +31,13 @@ from py_core import logging_util
 from py_core.classes.user_classes import BasicUser, verify_password
 from py_core import db as database
 
+from .async_db import async_database_url, dispose_async_database, init_async_database
 from .auth import MANAGER, load_user
+from .catalog_snapshot import get_snapshot, start_catalog_snapshot, stop_catalog_snapshot
+from .course_cache import COURSE_CACHE
+from .conflict_graph import get_conflict_graph
 from .general_exceptions import *
+from .optimizer_pool import shutdown_pool, start_manager
 from .routes import (r_download_calendar, r_experimental, r_google_api, r_schedule_optimizer,
                      r_user, r_fyic2023)
 from . import constants
@@ -81,6 +86,17 @@ class EZCampus_App(FastAPI):
         else:
             logging.warning("Cannot load r_google_api router")
 
+        self.add_event_handler("startup", start_catalog_snapshot)
+        self.add_event_handler("startup", r_fyic2023.preload_fyic_events)
+        self.add_event_handler("startup", start_manager)
+        self.add_event_handler("shutdown", stop_catalog_snapshot)
+        self.add_event_handler("shutdown", dispose_async_database)
+        self.add_event_handler("shutdown", shutdown_pool)
+
+        conflict_graph = get_conflict_graph()
+        if conflict_graph is not None:
+            logging.info(f"Loaded conflict graph of {conflict_graph.size} sections")
+
         logging.info("Adding routes")
         self.add_api_route("/", self.heartbeat, methods=["GET"])
         self.add_api_route("/heartbeat", self.heartbeat, methods=["GET"])
@@ -88,6 +104,7 @@ class EZCampus_App(FastAPI):
         self.add_api_route("/auth/token", self.docs_auth_token_login, methods=["POST"])
         self.add_api_route("/session-id", self.session_id, methods=["GET"])
         self.add_api_route("/homepage", self.homepage, methods=["GET"])
+        self.add_api_route("/catalog", self.catalog_status, methods=["GET"])
 
         logging.info("FastAPI ready")
 
@@ -135,6 +152,17 @@ class EZCampus_App(FastAPI):
             raise API_404_USER_NOT_FOUND
         return {"valid": user.name}
 
+    async def catalog_status(self):
+        """Get the catalog snapshot and course lookup cache statistics."""
+        snapshot = get_snapshot()
+        raise HTTPException(
+            status_code=status.HTTP_200_OK,
+            detail={
+                "snapshot": None if snapshot is None else snapshot.stats(),
+                "course_cache": COURSE_CACHE.stats(),
+            },
+        )
+
 
 def get_and_prase_args(args):
     import argparse
@@ -252,6 +280,15 @@ def main():
         db_pass=parsed_args.db_password,
         create=True,
     )
+    init_async_database(
+        url=async_database_url(
+            db_host=parsed_args.db_host,
+            db_port=parsed_args.db_port,
+            db_name=parsed_args.db_name,
+            db_user=parsed_args.db_username,
+            db_pass=parsed_args.db_password,
+        )
+    )
 
     EZCampus_App()
 
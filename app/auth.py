@@ -27,6 +27,7 @@ from py_core.user import get_users_via
 
 
 _AUTH_SECRET_KEY_NAME = "AUTH_SECRET_KEY"
+_ADMIN_USERNAMES_NAME = "ADMIN_USERNAMES"
 
 _secret = os.getenv(_AUTH_SECRET_KEY_NAME, None)
 
@@ -44,3 +45,21 @@ def load_user(username: str) -> json:
     if user is None or not user:
         return
     return user[0]
+
+
+def is_admin(user) -> bool:
+    """Check if a logged-in user is an admin.
+
+    Admins are allowlisted by username in the comma separated ADMIN_USERNAMES environment variable,
+    read on every check so .env values are loaded by then. Nobody is an admin if it isn't set.
+
+    Args:
+        user: Logged-in user, or None.
+
+    Returns:
+        True if the user is an admin, False otherwise.
+    """
+    if user is None:
+        return False
+    usernames = {u.strip() for u in os.getenv(_ADMIN_USERNAMES_NAME, "").split(",") if u.strip()}
+    return user.username in usernames
@@ -0,0 +1,35 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Conflict graph build script.
+
+Builds the section conflict graph file of terms, see app/conflict_graph.py. Run the same way as
+main.py, for example: "python app/build_conflict_graph.py --term 1 2 --output conflict_graph.bin".
+"""
+
+import sys
+
+if __package__ is None and not hasattr(sys, "frozen"):
+    # direct call of build_conflict_graph.py
+    import os.path
+
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.realpath(path))
+
+
+if __name__ == "__main__":
+    from app.conflict_graph import main
+
+    sys.exit(main())
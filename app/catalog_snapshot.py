@@ -0,0 +1,362 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""In-process term catalog snapshot module.
+
+All sections (Courses) of the active terms are loaded once at startup and kept in memory, indexed
+by course_id and course_data_id, so requests don't need a database round trip and ORM object
+construction per request. The snapshot is reloaded in the background by an asyncio task.
+
+Configuration (read at startup, so .env values are loaded by then):
+    CATALOG_SNAPSHOT_TERM_IDS: Comma separated term_ids to keep in memory, optional. The snapshot
+        is disabled if not set.
+    CATALOG_REFRESH_S: Seconds between background reloads, defaults to CATALOG_REFRESH_S.
+    SEAT_REFRESH_S: Seconds between background seat count polls, defaults to SEAT_REFRESH_S.
+
+Notes:
+    A snapshot is never mutated, a reload (or update) builds a new CatalogSnapshot and swaps it
+    in, so readers always see a consistent snapshot without locking. Courses of a snapshot are
+    shared by all requests and must not be mutated.
+
+    Requests for ids not covered by the snapshot (other terms) fall back to the course cache.
+
+    Seat counts are the only catalog data changing quickly, they are polled on their own: only the
+    sections updated since the last poll are read, the changed seat counts are applied to a copy of
+    the snapshot and every cached optimizer result involving them is invalidated. The poll
+    high-water mark is the latest update time seen by the database, never the local clock.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+
+from py_core.classes.course_class import Course
+from py_core.course import get_courses_via
+from py_core.db import db_globals as DG
+from py_core.db import db_tables as DT
+
+from app.constants import CATALOG_REFRESH_S, SEAT_REFRESH_S
+from app.course_cache import COURSE_CACHE
+from app.optimizer_cache import RESULT_CACHE
+
+__snapshot: "CatalogSnapshot | None" = None
+__seats_since: datetime | None = None  # Seat poll high-water mark of __snapshot.
+__refresh_tasks: list[asyncio.Task] = []
+
+
+class CatalogSnapshot:
+    """Immutable in-memory catalog of sections."""
+
+    def __init__(
+        self,
+        term_ids: list[int],
+        courses: list[Course],
+        seats_since: datetime | None = None,
+        version: str | None = None,
+    ):
+        self.term_ids = term_ids
+        self.seats_since = seats_since
+        self.loaded_at = time.time()
+        self.by_course_data_id: dict[int, Course] = {c.course_data_id: c for c in courses}
+        by_course_id = {}
+        for course in self.by_course_data_id.values():
+            by_course_id.setdefault(course.course_id, []).append(course)
+        self.by_course_id: dict[int, tuple[Course, ...]] = {
+            course_id: tuple(course_list) for course_id, course_list in by_course_id.items()
+        }
+        if version is None:
+            # Content version, equal across processes that loaded the same catalog data.
+            digest = hashlib.sha256()
+            for course_data_id in sorted(self.by_course_data_id):
+                digest.update(self.by_course_data_id[course_data_id].json().encode())
+            version = digest.hexdigest()[:16]
+        self.version = version
+
+    def covers(self, course_id_list: list[int] | None, course_data_id_list: list[int] | None):
+        """Check if every requested id is part of the snapshot.
+
+        Args:
+            course_id_list: Requested course_ids.
+            course_data_id_list: Requested course_data_ids.
+
+        Returns:
+            True if the snapshot can answer the request, False otherwise.
+        """
+        return all(i in self.by_course_id for i in course_id_list or []) and all(
+            i in self.by_course_data_id for i in course_data_id_list or []
+        )
+
+    def courses_via(
+        self, course_id_list: list[int] | None, course_data_id_list: list[int] | None
+    ) -> list[Course]:
+        """Get the Courses of the given course_ids and course_data_ids.
+
+        Args:
+            course_id_list: Requested course_ids, every section of each course is returned.
+            course_data_id_list: Requested course_data_ids.
+
+        Returns:
+            List of unique Course objects.
+        """
+        unique = {}
+        for course_id in course_id_list or []:
+            for course in self.by_course_id.get(course_id, ()):
+                unique[course.course_data_id] = course
+        for course_data_id in course_data_id_list or []:
+            course = self.by_course_data_id.get(course_data_id)
+            if course is not None:
+                unique[course_data_id] = course
+        return list(unique.values())
+
+    def with_seat_counts(self, seat_counts: dict[int, int]) -> tuple["CatalogSnapshot", list[int]]:
+        """Copy the snapshot with updated seat counts, unchanged Courses are shared.
+
+        Args:
+            seat_counts: Dictionary of course_data_id -> available_enrollment, ids not part of the
+                snapshot are ignored.
+
+        Returns:
+            Tuple of (new CatalogSnapshot, course_data_ids whose seat count changed).
+        """
+        changed = sorted(
+            course_data_id
+            for course_data_id, seats in seat_counts.items()
+            if course_data_id in self.by_course_data_id
+            and self.by_course_data_id[course_data_id].available_enrollment != seats
+        )
+        if not changed:
+            return self, changed
+
+        courses = dict(self.by_course_data_id)
+        digest = hashlib.sha256(self.version.encode())
+        for course_data_id in changed:
+            seats = seat_counts[course_data_id]
+            courses[course_data_id] = courses[course_data_id].copy(
+                update={"available_enrollment": seats}
+            )
+            digest.update(f"{course_data_id}:{seats};".encode())
+        snapshot = CatalogSnapshot(
+            term_ids=self.term_ids,
+            courses=list(courses.values()),
+            seats_since=self.seats_since,
+            version=digest.hexdigest()[:16],
+        )
+        return snapshot, changed
+
+    def stats(self) -> dict:
+        """Get the snapshot statistics.
+
+        Returns:
+            Dictionary of the snapshot's terms, size, version and load time.
+        """
+        return {
+            "term_ids": self.term_ids,
+            "courses": len(self.by_course_id),
+            "sections": len(self.by_course_data_id),
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def get_snapshot() -> CatalogSnapshot | None:
+    """Get the current catalog snapshot.
+
+    Returns:
+        The CatalogSnapshot, None if the snapshot is disabled or not loaded yet.
+    """
+    return __snapshot
+
+
+def set_snapshot(snapshot: CatalogSnapshot):
+    """Swap in a new catalog snapshot.
+
+    Args:
+        snapshot: The new CatalogSnapshot.
+    """
+    global __snapshot
+
+    __snapshot = snapshot
+
+
+def get_catalog_courses(
+    course_id_list: list[int] = None, course_data_id_list: list[int] = None
+) -> list[Course]:
+    """Drop in replacement of py_core get_courses_via(), served from the snapshot when possible.
+
+    Ids not covered by the snapshot are looked up through the read-through course cache.
+
+    Args:
+        course_id_list: Requested course_ids.
+        course_data_id_list: Requested course_data_ids.
+
+    Returns:
+        List of Course objects.
+    """
+    snapshot = __snapshot
+    if snapshot is None:
+        return COURSE_CACHE.get_courses(
+            course_id_list=course_id_list, course_data_id_list=course_data_id_list
+        )
+    if snapshot.covers(course_id_list, course_data_id_list):
+        return snapshot.courses_via(course_id_list, course_data_id_list)
+    # Ids of other terms are looked up in the course cache.
+    courses = snapshot.courses_via(course_id_list, course_data_id_list)
+    courses += COURSE_CACHE.get_courses(
+        course_id_list=[i for i in course_id_list or [] if i not in snapshot.by_course_id],
+        course_data_id_list=[
+            i for i in course_data_id_list or [] if i not in snapshot.by_course_data_id
+        ],
+    )
+    return list({c.course_data_id: c for c in courses}.values())
+
+
+def load_snapshot(term_ids: list[int]) -> CatalogSnapshot:
+    """Load a catalog snapshot of all sections of the given terms from the database.
+
+    Args:
+        term_ids: Terms to load.
+
+    Returns:
+        The loaded CatalogSnapshot.
+    """
+    with DG.Session.begin() as session:
+        # Taken before the rows are read, seat updates racing the load are polled again.
+        seats_since = session.query(func.max(DT.TBL_Course_Data.updated_at)).scalar()
+        course_ids = [
+            row[0]
+            for row in session.query(DT.TBL_Course.course_id)
+            .filter(DT.TBL_Course.term_id.in_(term_ids))
+            .all()
+        ]
+    courses = get_courses_via(course_id_list=course_ids) if course_ids else []
+    return CatalogSnapshot(term_ids=term_ids, courses=courses, seats_since=seats_since)
+
+
+def load_seat_changes(since: datetime | None) -> tuple[dict[int, int], datetime | None]:
+    """Load the seat counts of the sections updated after since.
+
+    Args:
+        since: Seat poll high-water mark, None loads every section's seat count.
+
+    Returns:
+        Tuple of (course_data_id -> available_enrollment, new high-water mark).
+    """
+    table = DT.TBL_Course_Data
+    with DG.Session.begin() as session:
+        query = session.query(table.course_data_id, table.available_enrollment, table.updated_at)
+        if since is not None:
+            query = query.filter(table.updated_at > since)
+        rows = query.all()
+    seat_counts = {}
+    for course_data_id, seats, updated_at in rows:
+        seat_counts[course_data_id] = seats
+        if updated_at is not None and (since is None or updated_at > since):
+            since = updated_at
+    return seat_counts, since
+
+
+def apply_seat_counts(seat_counts: dict[int, int]) -> list[int]:
+    """Apply seat counts to the current snapshot and invalidate the affected optimizer results.
+
+    Args:
+        seat_counts: Dictionary of course_data_id -> available_enrollment.
+
+    Returns:
+        course_data_ids whose seat count changed.
+    """
+    if __snapshot is None:
+        return []
+    snapshot, changed = __snapshot.with_seat_counts(seat_counts)
+    if changed:
+        set_snapshot(snapshot)
+        RESULT_CACHE.invalidate_course_data_ids(changed)
+    return changed
+
+
+async def start_catalog_snapshot():
+    """Startup event handler, load the snapshot and start its background refresh tasks."""
+    term_ids = __configured_term_ids()
+    if not term_ids:
+        return
+    try:
+        __set_loaded(await run_in_threadpool(load_snapshot, term_ids))
+        logging.info(f"Loaded catalog snapshot {__snapshot.stats()}")
+    except Exception as e:  # Serve from the database until a refresh succeeds.
+        logging.error(f"Cannot load catalog snapshot of terms {term_ids}: {e}")
+    refresh_s = float(os.getenv("CATALOG_REFRESH_S", CATALOG_REFRESH_S))
+    seat_refresh_s = float(os.getenv("SEAT_REFRESH_S", SEAT_REFRESH_S))
+    __refresh_tasks.append(asyncio.create_task(__refresh_loop(term_ids, refresh_s)))
+    __refresh_tasks.append(asyncio.create_task(__seat_loop(seat_refresh_s)))
+
+
+async def stop_catalog_snapshot():
+    """Shutdown event handler, stop the background refresh tasks."""
+    while __refresh_tasks:
+        __refresh_tasks.pop().cancel()
+
+
+async def __refresh_loop(term_ids: list[int], refresh_s: float):
+    """Reload the snapshot every refresh_s seconds."""
+    while True:
+        await asyncio.sleep(refresh_s)
+        try:
+            snapshot = await run_in_threadpool(load_snapshot, term_ids)
+        except Exception as e:  # Keep serving the previous snapshot.
+            logging.error(f"Cannot refresh catalog snapshot of terms {term_ids}: {e}")
+            continue
+        __set_loaded(snapshot)
+        logging.info(f"Refreshed catalog snapshot {snapshot.stats()}")
+
+
+async def __seat_loop(refresh_s: float):
+    """Poll and apply the changed seat counts every refresh_s seconds."""
+    global __seats_since
+
+    while True:
+        await asyncio.sleep(refresh_s)
+        if __snapshot is None:
+            continue
+        loaded = __snapshot
+        try:
+            seat_counts, since = await run_in_threadpool(load_seat_changes, __seats_since)
+        except Exception as e:  # Retry on the next poll.
+            logging.error(f"Cannot poll seat counts: {e}")
+            continue
+        if __snapshot is not loaded and __snapshot.seats_since != loaded.seats_since:
+            continue  # Reloaded meanwhile, poll again from the new snapshot's high-water mark.
+        changed = apply_seat_counts(seat_counts)
+        __seats_since = since
+        if changed:
+            logging.info(f"Applied {len(changed)} seat count changes to the catalog snapshot")
+
+
+def __set_loaded(snapshot: CatalogSnapshot):
+    """Swap in a freshly loaded snapshot and continue seat polls from its high-water mark."""
+    global __seats_since
+
+    set_snapshot(snapshot)
+    __seats_since = snapshot.seats_since
+
+
+def __configured_term_ids() -> list[int]:
+    """term_ids of CATALOG_SNAPSHOT_TERM_IDS, empty if not set."""
+    value = os.getenv("CATALOG_SNAPSHOT_TERM_IDS", "")
+    return [int(term_id) for term_id in value.split(",") if term_id.strip()]
@@ -0,0 +1,150 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Conditional response module.
+
+Read endpoints whose payload is deterministic for a given input and catalog data get a GET variant
+with a strong ETag and Cache-Control headers. A request whose If-None-Match matches the current
+ETag is answered with an empty 304, so browsers and CDNs only pull a payload when it changed.
+
+Notes:
+    ETags of Course based payloads are derived from the Courses' content (the catalog data the
+    payload is generated from), so a 304 is decided before the payload is generated.
+"""
+
+import hashlib
+import json
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from py_core.classes.course_class import Course
+
+
+def content_etag(*parts: bytes | str) -> str:
+    """Get the strong ETag of content parts.
+
+    Args:
+        *parts: Content (or content version) parts.
+
+    Returns:
+        Quoted strong ETag.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def courses_etag(kind: str, courses: list[Course]) -> str:
+    """Get the strong ETag of a payload generated from Courses.
+
+    Args:
+        kind: Kind of payload, for example the endpoint path.
+        courses: Courses the payload is generated from.
+
+    Returns:
+        Quoted strong ETag.
+    """
+    unique = {c.course_data_id: c for c in courses}
+    return content_etag(kind, *(unique[i].json() for i in sorted(unique)))
+
+
+def cache_headers(etag: str, cache_control: str) -> dict[str, str]:
+    """Get the caching headers of a response.
+
+    Args:
+        etag: Quoted ETag of the response.
+        cache_control: Cache-Control header value.
+
+    Returns:
+        Dictionary of headers.
+    """
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def is_not_modified(r: Request, etag: str) -> bool:
+    """Check if a request's If-None-Match matches an ETag (weak comparison, as for GET).
+
+    Args:
+        r: fastapi.Request object.
+        etag: Quoted current ETag.
+
+    Returns:
+        True if the client's copy is current, False otherwise.
+    """
+    if_none_match = r.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    """Get the 304 response of an ETag.
+
+    Args:
+        etag: Quoted current ETag.
+        cache_control: Cache-Control header value.
+
+    Returns:
+        Empty 304 response.
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, cache_control)
+    )
+
+
+def json_body(content) -> bytes:
+    """Serialize content the same as fastapi's JSONResponse.
+
+    Args:
+        content: Any jsonable_encoder() compatible content.
+
+    Returns:
+        JSON bytes.
+    """
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def conditional_json_response(
+    r: Request, body: bytes, cache_control: str, etag: str | None = None
+) -> Response:
+    """Get the conditional response of a JSON body.
+
+    Args:
+        r: fastapi.Request object.
+        body: JSON bytes, see json_body().
+        cache_control: Cache-Control header value.
+        etag: Optional quoted ETag, default is the content ETag of the body.
+
+    Returns:
+        Empty 304 response if the client's copy is current, the JSON response otherwise.
+    """
+    if etag is None:
+        etag = content_etag(body)
+    if is_not_modified(r, etag):
+        return not_modified_response(etag, cache_control)
+    return Response(
+        content=body, media_type="application/json", headers=cache_headers(etag, cache_control)
+    )
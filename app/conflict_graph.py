@@ -0,0 +1,213 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Section conflict graph module.
+
+Section vs section time conflicts are fixed once a term's timetable is published. The full pairwise
+conflict adjacency of a term's sections is built once into a bitmatrix file which is memory-mapped
+read only, so every uvicorn worker (and optimizer pool process) shares the same pages.
+
+File format (little endian):
+    Header: magic b"EZCG", version u32, section count n u32, row byte length u32.
+    n int64 course_data_ids, the section index of a course_data_id is its position.
+    n rows of row byte length bytes, bit j of row i is set if sections i and j conflict.
+
+Configuration:
+    CONFLICT_GRAPH_FILE: Path of the conflict graph file used by the optimizer, optional.
+
+Building (from the repository root, with the same database environment variables as the API):
+    python app/build_conflict_graph.py --term 1 2 --output conflict_graph.bin
+
+    Rebuild the file whenever a term's timetable changes, running workers reopen a rebuilt file.
+"""
+
+import logging
+import mmap
+import os
+import struct
+from array import array
+
+from py_core.classes.course_class import Course, schedule_time_conflicts
+
+from app.timetable_bitset import course_mask
+
+MAGIC = b"EZCG"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+
+__loaded_graph: "ConflictGraph | None" = None
+__loaded_key: tuple | None = None  # (path, mtime) of __loaded_graph.
+
+
+class ConflictGraph:
+    """Read only, memory-mapped section conflict graph."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.__mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.row_bytes = HEADER.unpack_from(self.__mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} conflict graph file")
+        ids = array("q")
+        ids.frombytes(self.__mm[HEADER.size : HEADER.size + 8 * self.size])
+        self.__index = {course_data_id: i for i, course_data_id in enumerate(ids)}
+        self.__rows_offset = HEADER.size + 8 * self.size
+
+    def index_of(self, course_data_id: int) -> int | None:
+        """Get the section index of a course_data_id.
+
+        Args:
+            course_data_id: Section course_data_id.
+
+        Returns:
+            Section index, None if the section is not part of the graph.
+        """
+        return self.__index.get(course_data_id)
+
+    def row(self, index: int) -> int:
+        """Get the conflict row of a section.
+
+        Args:
+            index: Section index.
+
+        Returns:
+            Bitmask where bit j is set if section j conflicts with the section.
+        """
+        start = self.__rows_offset + index * self.row_bytes
+        return int.from_bytes(self.__mm[start : start + self.row_bytes], "little")
+
+    def conflicts(self, index_a: int, index_b: int) -> bool:
+        """Check if two sections conflict.
+
+        Args:
+            index_a: Section index.
+            index_b: Section index.
+
+        Returns:
+            True if the sections conflict, False otherwise.
+        """
+        byte = self.__mm[self.__rows_offset + index_a * self.row_bytes + (index_b >> 3)]
+        return bool(byte >> (index_b & 7) & 1)
+
+    def close(self):
+        self.__mm.close()
+
+
+def build_conflict_graph(courses: list[Course], path: str):
+    """Build a conflict graph file of a term's sections.
+
+    Args:
+        courses: Every section (Course) of the term(s), duplicate course_data_ids are ignored.
+        path: File path to write, replaced atomically.
+    """
+    unique = {}
+    for course in courses:
+        unique.setdefault(course.course_data_id, course)
+    sections = list(unique.values())
+    masks = [course_mask(course) for course in sections]
+    size = len(sections)
+    row_bytes = (size + 7) // 8
+
+    rows = [0] * size
+    for i in range(size):
+        mask_i = masks[i]
+        for j in range(i + 1, size):
+            # Disjoint weekly masks can never conflict, only overlapping pairs get the exact check.
+            if mask_i & masks[j] and schedule_time_conflicts([sections[i], sections[j]]):
+                rows[i] |= 1 << j
+                rows[j] |= 1 << i
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, row_bytes))
+        f.write(array("q", [c.course_data_id for c in sections]).tobytes())
+        for row in rows:
+            f.write(row.to_bytes(row_bytes, "little"))
+    os.replace(temp_path, path)
+    logging.info(f"Built conflict graph of {size} sections at {path}")
+
+
+def get_conflict_graph() -> ConflictGraph | None:
+    """Get the configured conflict graph of this process, reopened if its file was rebuilt.
+
+    Returns:
+        The ConflictGraph, None if CONFLICT_GRAPH_FILE is not set or can't be read.
+    """
+    global __loaded_graph, __loaded_key
+
+    path = os.getenv("CONFLICT_GRAPH_FILE")
+    if not path:
+        return None
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    if key != __loaded_key:
+        try:
+            graph = ConflictGraph(path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cannot load conflict graph {path}: {e}")
+            return None
+        if __loaded_graph is not None:
+            __loaded_graph.close()
+        __loaded_graph, __loaded_key = graph, key
+    return __loaded_graph
+
+
+def main(args: list[str] = None) -> int:
+    """Build the conflict graph file of every section of the given terms, from the database.
+
+    Args:
+        args: Command line arguments, default is sys.argv[1:].
+
+    Returns:
+        Exit code.
+    """
+    import argparse
+
+    from dotenv import load_dotenv
+
+    from py_core import db as database
+
+    from app.catalog_snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Build the section conflict graph file of terms.")
+    parser.add_argument(
+        "-t", "--term", dest="term_ids", type=int, nargs="+", required=True, help="The term_id(s)"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="The conflict graph file, see CONFLICT_GRAPH_FILE"
+    )
+    parsed_args = parser.parse_args(args)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    database.init_database(
+        use_mysql=True,
+        db_port=int(database.get_env_db_port(3306)),
+        db_host=str(database.get_env_db_host("localhost")),
+        db_name=str(database.get_env_db_name("ezcampus_db")),
+        db_user=str(database.get_env_db_user("test")),
+        db_pass=str(database.get_env_db_password("root")),
+        create=False,
+    )
+
+    courses = list(load_snapshot(parsed_args.term_ids).by_course_data_id.values())
+    if not courses:
+        logging.error(f"No sections found for terms {parsed_args.term_ids}")
+        return 1
+    build_conflict_graph(courses=courses, path=parsed_args.output)
+    return 0
@@ -26,3 +26,19 @@ BASE_NOTION_CSV_FILENAME = "notion_csv.csv"
 
 # Cache directory:
 CACHE_DIR = "cache/"
+
+# Optimizer result cache:
+OPTIMIZER_CACHE_SIZE = 1024  # Maximum number of cached optimizer results.
+OPTIMIZER_CACHE_TTL_S = 300  # Seconds an optimizer result stays cached.
+
+# Term catalog snapshot:
+CATALOG_REFRESH_S = 900  # Seconds between background catalog snapshot reloads.
+SEAT_REFRESH_S = 30  # Seconds between background seat count polls.
+
+# Course lookup cache:
+COURSE_CACHE_SIZE = 20_000  # Maximum number of cached course_ids (and course_data_ids).
+COURSE_CACHE_TTL_S = 60  # Seconds a course lookup stays cached.
+
+# Cache-Control of conditional GET responses:
+EVENTS_CACHE_CONTROL = "public, max-age=300"  # Event lists.
+EXPORT_CACHE_CONTROL = "public, max-age=300"  # Calendar exports.
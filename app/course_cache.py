@@ -0,0 +1,167 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Course lookup cache module.
+
+Read-through cache of py_core get_courses_via() lookups, with LRU eviction and a TTL. Courses are
+cached per course_id (every section of the course) and per course_data_id (a single section). A
+lookup only fetches the ids missing from the cache, in one query per kind of id.
+
+Notes:
+    Ids not found in the database are cached as well (as no Courses), so unknown ids don't cost a
+    query every time either.
+
+    Cached Courses are shared by all requests and must not be mutated. Seat counts of cached
+    Courses can be up to the TTL old.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from py_core.classes.course_class import Course
+from py_core.course import get_courses_via
+
+from app.constants import COURSE_CACHE_SIZE, COURSE_CACHE_TTL_S
+
+
+class CourseCache:
+    """Read-through LRU + TTL cache of Courses by course_id and course_data_id."""
+
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        # course_id -> (expires_at, Courses of the course_id)
+        self.__by_course_id: OrderedDict[int, tuple[float, tuple[Course, ...]]] = OrderedDict()
+        # course_data_id -> (expires_at, Course or None if not found)
+        self.__by_course_data_id: OrderedDict[int, tuple[float, Course | None]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def get_courses(
+        self, course_id_list: list[int] = None, course_data_id_list: list[int] = None
+    ) -> list[Course]:
+        """Drop in replacement of py_core get_courses_via(), fetching only the uncached ids.
+
+        Args:
+            course_id_list: Requested course_ids.
+            course_data_id_list: Requested course_data_ids.
+
+        Returns:
+            List of unique Course objects, in requested id order.
+        """
+        course_ids = list(dict.fromkeys(course_id_list or []))
+        course_data_ids = list(dict.fromkeys(course_data_id_list or []))
+        cached_by_course_id, missing_course_ids = self.__lookup(self.__by_course_id, course_ids)
+        cached_by_course_data_id, missing_course_data_ids = self.__lookup(
+            self.__by_course_data_id, course_data_ids
+        )
+
+        if missing_course_ids:
+            fetched = {course_id: [] for course_id in missing_course_ids}
+            for course in self.__fetch(course_id_list=missing_course_ids):
+                fetched.setdefault(course.course_id, []).append(course)
+            fetched = {course_id: tuple(courses) for course_id, courses in fetched.items()}
+            self.__store(self.__by_course_id, fetched)
+            cached_by_course_id.update(fetched)
+        if missing_course_data_ids:
+            fetched = dict.fromkeys(missing_course_data_ids)
+            for course in self.__fetch(course_data_id_list=missing_course_data_ids):
+                fetched[course.course_data_id] = course
+            self.__store(self.__by_course_data_id, fetched)
+            cached_by_course_data_id.update(fetched)
+
+        unique = {}
+        for course_id in course_ids:
+            for course in cached_by_course_id[course_id]:
+                unique[course.course_data_id] = course
+        for course_data_id in course_data_ids:
+            course = cached_by_course_data_id[course_data_id]
+            if course is not None:
+                unique[course_data_id] = course
+        return list(unique.values())
+
+    def invalidate(self, course_ids=(), course_data_ids=()):
+        """Drop cached lookups.
+
+        Args:
+            course_ids: Iterable of course_ids to drop.
+            course_data_ids: Iterable of course_data_ids to drop.
+        """
+        with self.__lock:
+            for course_id in course_ids:
+                self.__by_course_id.pop(course_id, None)
+            for course_data_id in course_data_ids:
+                self.__by_course_data_id.pop(course_data_id, None)
+
+    def stats(self) -> dict:
+        """Get the cache statistics.
+
+        Returns:
+            Dictionary of the cache's sizes, hits, misses (per id) and queries.
+        """
+        return {
+            "course_ids": len(self.__by_course_id),
+            "course_data_ids": len(self.__by_course_data_id),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "queries": self.queries,
+        }
+
+    def __lookup(self, entries: OrderedDict, ids: list[int]) -> tuple[dict, list[int]]:
+        """Get the cached values of ids, expired entries are dropped.
+
+        Returns:
+            Tuple of (id -> cached value, ids not cached).
+        """
+        now = time.monotonic()
+        cached, missing = {}, []
+        with self.__lock:
+            for i in ids:
+                entry = entries.get(i)
+                if entry is not None and entry[0] < now:
+                    del entries[i]
+                    entry = None
+                if entry is None:
+                    missing.append(i)
+                    continue
+                entries.move_to_end(i)
+                cached[i] = entry[1]
+            self.hits += len(cached)
+            self.misses += len(missing)
+        return cached, missing
+
+    def __store(self, entries: OrderedDict, values: dict):
+        """Cache fetched values, evicting the least recently used entries."""
+        expires_at = time.monotonic() + self.ttl_s
+        with self.__lock:
+            for i, value in values.items():
+                entries[i] = (expires_at, value)
+                entries.move_to_end(i)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+
+    def __fetch(self, **kwargs) -> list[Course]:
+        """Fetch Courses from the database."""
+        with self.__lock:
+            self.queries += 1
+        return get_courses_via(**kwargs)
+
+
+COURSE_CACHE = CourseCache(max_size=COURSE_CACHE_SIZE, ttl_s=COURSE_CACHE_TTL_S)
@@ -60,3 +60,6 @@ API_200_HEARTBEAT = HTTPException(
 API_401_UNAUTHORIZED_USER = HTTPException(
     status.HTTP_401_UNAUTHORIZED, "Invalid or expired auth token"
 )
+API_403_FORBIDDEN_USER = HTTPException(
+    status.HTTP_403_FORBIDDEN, "User is not allowed to perform this action"
+)
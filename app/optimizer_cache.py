@@ -0,0 +1,180 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Optimizer result cache module.
+
+Optimizer results are cached by a canonical fingerprint of the request, with LRU eviction and a
+TTL. Every entry also remembers the seat counts of the courses it was computed from: an entry is
+dropped as soon as the seat counts of any of its courses change.
+
+Notes:
+    fingerprint: sha256 hex digest of the canonical JSON of every request field that can change
+        the optimizer's result. Lists that are order independent are sorted so equivalent requests
+        share a fingerprint.
+
+    seat_signature: Tuple of (course_data_id, available_enrollment) of every Course involved in a
+        result, sorted by course_data_id.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from py_core.classes.course_class import Course
+
+from app.constants import OPTIMIZER_CACHE_SIZE, OPTIMIZER_CACHE_TTL_S
+
+
+def request_fingerprint(kind: str, r_model: BaseModel, **extra) -> str:
+    """Get the canonical fingerprint of an optimizer request.
+
+    Args:
+        kind: Kind of optimizer result, for example the endpoint name.
+        r_model: Optimizer request model object.
+        **extra: Any other (JSON serializable) value changing the result, for example top-k's k.
+
+    Returns:
+        See this module's docstring.
+    """
+    canonical = json.loads(r_model.json())
+    canonical["course_ids"] = sorted(set(canonical.get("course_ids") or []))
+    canonical["required_course_data_ids"] = sorted(
+        set(canonical.get("required_course_data_ids") or [])
+    )
+    if isinstance(canonical.get("restrictions_met"), dict):
+        canonical["restrictions_met"] = {
+            r_type: sorted(r_list, key=str) if isinstance(r_list, list) else r_list
+            for r_type, r_list in canonical["restrictions_met"].items()
+        }
+    canonical["__kind"] = kind
+    canonical["__extra"] = extra
+    return hashlib.sha256(
+        json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+
+
+def seat_signature(courses: list[Course]) -> tuple[tuple[int, int], ...]:
+    """Get the seat signature of a list of Courses.
+
+    Args:
+        courses: Courses involved in a result.
+
+    Returns:
+        See this module's docstring.
+    """
+    return tuple(sorted({(c.course_data_id, c.available_enrollment) for c in courses}))
+
+
+class OptimizerResultCache:
+    """LRU + TTL cache of optimizer results, invalidated by seat count changes."""
+
+    def __init__(self, max_size: int, ttl_s: float):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        # fingerprint -> (expires_at, seat_signature, result)
+        self.__entries: OrderedDict[str, tuple[float, tuple, dict]] = OrderedDict()
+        # course_data_id -> fingerprints of the entries involving it.
+        self.__by_course_data_id: dict[int, set[str]] = {}
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: str, signature: tuple) -> dict | None:
+        """Get a cached result.
+
+        Args:
+            fingerprint: Request fingerprint.
+            signature: Current seat signature of the Courses involved in the request.
+
+        Returns:
+            The cached result, None if not cached, expired or computed from other seat counts.
+        """
+        with self.__lock:
+            entry = self.__entries.get(fingerprint)
+            if entry is not None and (entry[0] < time.monotonic() or entry[1] != signature):
+                self.__remove(fingerprint)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, fingerprint: str, signature: tuple, result: dict):
+        """Cache a result, the result must not be mutated afterwards.
+
+        Args:
+            fingerprint: Request fingerprint.
+            signature: Seat signature of the Courses involved in the result.
+            result: Optimizer result.
+        """
+        with self.__lock:
+            self.__remove(fingerprint)
+            self.__entries[fingerprint] = (time.monotonic() + self.ttl_s, signature, result)
+            for course_data_id, _ in signature:
+                self.__by_course_data_id.setdefault(course_data_id, set()).add(fingerprint)
+            while len(self.__entries) > self.max_size:
+                self.__remove(next(iter(self.__entries)))
+
+    def invalidate_course_data_ids(self, course_data_ids) -> int:
+        """Drop every cached result involving any of the given sections.
+
+        Args:
+            course_data_ids: Iterable of course_data_ids whose seat counts (or data) changed.
+
+        Returns:
+            Number of results dropped.
+        """
+        with self.__lock:
+            fingerprints = set()
+            for course_data_id in course_data_ids:
+                fingerprints |= self.__by_course_data_id.get(course_data_id, set())
+            for fingerprint in fingerprints:
+                self.__remove(fingerprint)
+            return len(fingerprints)
+
+    def stats(self) -> dict:
+        """Get the cache statistics.
+
+        Returns:
+            Dictionary of the cache's size, hits and misses.
+        """
+        return {
+            "size": len(self.__entries),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __remove(self, fingerprint: str):
+        """Remove an entry and its index references, the lock must be held."""
+        entry = self.__entries.pop(fingerprint, None)
+        if entry is None:
+            return
+        for course_data_id, _ in entry[1]:
+            fingerprints = self.__by_course_data_id.get(course_data_id)
+            if fingerprints is not None:
+                fingerprints.discard(fingerprint)
+                if not fingerprints:
+                    del self.__by_course_data_id[course_data_id]
+
+
+RESULT_CACHE = OptimizerResultCache(max_size=OPTIMIZER_CACHE_SIZE, ttl_s=OPTIMIZER_CACHE_TTL_S)
@@ -0,0 +1,218 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Optimizer process pool module.
+
+CPU bound optimizer work is sent to a ProcessPoolExecutor so it never runs on the event loop, which
+keeps every other endpoint of the uvicorn worker responsive under optimizer load.
+
+Configuration (read when the pool is first used, so .env values are loaded by then):
+    OPTIMIZER_POOL_WORKERS: Number of worker processes, defaults to os.cpu_count().
+    OPTIMIZER_TIMEOUT_S: Per-request timeout in seconds, defaults to DEFAULT_TIMEOUT_S.
+
+Notes:
+    A job is cancelled when its request times out or its client disconnects. Jobs still waiting in
+    the pool queue are dropped, however a job already running in a worker process can't be
+    interrupted, its result is discarded. Functions taking a deadline_ms keyword get the request
+    time left when the job starts as their budget (see __run_job()), so they stop by themselves at
+    the latest when the request times out.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+
+from fastapi import HTTPException, Request, status
+
+DEFAULT_TIMEOUT_S = 30.0
+DISCONNECT_POLL_S = 0.25  # Interval between client disconnect checks while a job runs.
+
+# HTTPExceptions
+API_503_OPTIMIZER_TIMEOUT = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="The optimizer timed out, the service may be under heavy load. Please try again later.",
+)
+API_499_CLIENT_DISCONNECTED = HTTPException(
+    status_code=499,  # Non-standard "client closed request", only ever logged.
+    detail="Client disconnected before the optimizer finished.",
+)
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+_QUEUE_LOCK = threading.Lock()
+_MANAGER: SyncManager | None = None
+_pool_workers = 0
+_timeout_s = DEFAULT_TIMEOUT_S
+_queue_depth = 0  # Jobs submitted to the pool and not yet done (queued + running).
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get the optimizer process pool, create it on first use.
+
+    Returns:
+        The optimizer ProcessPoolExecutor.
+    """
+    global _POOL, _pool_workers, _timeout_s
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _pool_workers = int(os.getenv("OPTIMIZER_POOL_WORKERS", os.cpu_count() or 1))
+            _timeout_s = optimizer_timeout_s()
+            logging.info(
+                f"Creating optimizer pool with {_pool_workers} workers, timeout {_timeout_s}s"
+            )
+            _POOL = ProcessPoolExecutor(max_workers=_pool_workers)
+        return _POOL
+
+
+def optimizer_timeout_s() -> float:
+    """Get the per-request optimizer timeout.
+
+    Returns:
+        OPTIMIZER_TIMEOUT_S in seconds, DEFAULT_TIMEOUT_S if not set.
+    """
+    return float(os.getenv("OPTIMIZER_TIMEOUT_S", DEFAULT_TIMEOUT_S))
+
+
+def get_manager() -> SyncManager:
+    """Get the multiprocessing manager used to share progress queues with the pool, create it on
+    first use.
+
+    Returns:
+        The started SyncManager.
+    """
+    global _MANAGER
+
+    with _POOL_LOCK:
+        if _MANAGER is None:
+            _MANAGER = multiprocessing.Manager()
+        return _MANAGER
+
+
+def start_manager():
+    """Start the multiprocessing manager, run at startup so no request starts its server process
+    on the event loop."""
+    get_manager()
+
+
+def shutdown_pool():
+    """Shut down the optimizer process pool (and manager), pending jobs are cancelled."""
+    global _POOL, _MANAGER
+
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+        if _MANAGER is not None:
+            _MANAGER.shutdown()
+            _MANAGER = None
+
+
+def pool_status() -> dict:
+    """Get the optimizer process pool status.
+
+    Returns:
+        Dictionary of the pool's worker count, queue depth and per-request timeout.
+    """
+    return {
+        "workers": _pool_workers if _POOL is not None else 0,
+        "queue_depth": _queue_depth,
+        "timeout_s": _timeout_s,
+    }
+
+
+async def run_in_pool(r: Request, fn, **kwargs):
+    """Run fn(**kwargs) in the optimizer process pool and await its result.
+
+    Args:
+        r: fastapi.Request object of the request waiting on the job.
+        fn: Picklable (module level) function to run.
+        **kwargs: Picklable keyword arguments passed to fn. A deadline_ms keyword is capped at the
+            request time left when the job starts.
+
+    Returns:
+        The return value of fn.
+
+    Raises:
+        API_503_OPTIMIZER_TIMEOUT: The job didn't finish within the per-request timeout.
+        API_499_CLIENT_DISCONNECTED: The client disconnected before the job finished.
+        HTTPException: Any HTTPException raised by fn.
+    """
+    global _queue_depth
+
+    pool = get_pool()
+    # Wall clock, the monotonic clock of a worker process may have another reference point.
+    future = pool.submit(__run_job, fn, kwargs, time.time() + _timeout_s)
+    with _QUEUE_LOCK:
+        _queue_depth += 1
+    future.add_done_callback(__job_done)
+
+    loop = asyncio.get_running_loop()
+    wrapped = asyncio.wrap_future(future)
+    deadline = loop.time() + _timeout_s
+    try:
+        while not wrapped.done():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise API_503_OPTIMIZER_TIMEOUT
+            await asyncio.wait({wrapped}, timeout=min(DISCONNECT_POLL_S, remaining))
+            if not wrapped.done() and await r.is_disconnected():
+                raise API_499_CLIENT_DISCONNECTED
+    finally:
+        if not wrapped.done():
+            future.cancel()  # Only effective while the job is still queued.
+            wrapped.cancel()
+
+    outcome = wrapped.result()
+    if outcome[0] == "http":
+        raise HTTPException(status_code=outcome[1], detail=outcome[2])
+    return outcome[1]
+
+
+def __run_job(fn, kwargs: dict, expires_at: float) -> tuple:
+    """Worker process entry point.
+
+    HTTPExceptions don't survive pickling, so they are returned as plain values and re-raised by
+    run_in_pool().
+
+    Args:
+        fn: Function to run.
+        kwargs: Keyword arguments passed to fn.
+        expires_at: time.time() value the request times out at.
+
+    Returns:
+        ("ok", result) or ("http", status_code, detail).
+    """
+    remaining_ms = int((expires_at - time.time()) * 1000)
+    if remaining_ms <= 0:  # The request already timed out while the job was queued.
+        return "http", API_503_OPTIMIZER_TIMEOUT.status_code, API_503_OPTIMIZER_TIMEOUT.detail
+    if "deadline_ms" in kwargs:  # Stop by itself once the request timed out.
+        kwargs["deadline_ms"] = min(kwargs["deadline_ms"] or remaining_ms, remaining_ms)
+    try:
+        return "ok", fn(**kwargs)
+    except HTTPException as h:
+        return "http", h.status_code, h.detail
+
+
+def __job_done(_: Future):
+    global _queue_depth
+
+    with _QUEUE_LOCK:
+        _queue_depth -= 1
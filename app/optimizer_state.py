@@ -0,0 +1,104 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Optimizer state token module.
+
+An optimizer result carries an opaque state token of the request's course_ids, the resulting
+manifest, the chosen sections and the removal level (confidence) reached. A follow-up request
+sends the token back with a diff to warm start the optimizer from the previous schedule.
+
+Tokens are signed with the session_secret_key, a token is only accepted as created by this API.
+Without a session_secret_key no tokens are created.
+
+Notes:
+    state: Dictionary of:
+        course_ids: course_ids optimized for.
+        manifest: Simplified manifest of the schedule.
+        course_data_ids: course_data_ids of the schedule.
+        confidence: Confidence of the schedule.
+"""
+
+import os
+
+from fastapi import HTTPException, status
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from py_core.classes.course_class import Course
+
+STATE_VERSION = 1
+__SALT = "optimizer-state"
+
+# HTTPExceptions
+API_400_INVALID_STATE_TOKEN = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid optimizer state_token.",
+)
+
+
+def encode_state_token(
+    result: dict, courses: list[Course], required_courses: list[Course]
+) -> str | None:
+    """Create the state token of an optimizer result.
+
+    Args:
+        result: course_level_optimizer() result.
+        courses: Option Courses of the request.
+        required_courses: Required Courses of the request.
+
+    Returns:
+        The state token, None if no session_secret_key is configured.
+    """
+    serializer = __serializer()
+    if serializer is None:
+        return None
+    ids_by_crn = {c.crn: c.course_data_id for c in courses + required_courses}
+    state = {
+        "v": STATE_VERSION,
+        "course_ids": sorted({c.course_id for c in courses}),
+        "manifest": result["simplified_manifest"],
+        "course_data_ids": [ids_by_crn[crn] for crn in result["crns"] if crn in ids_by_crn],
+        "confidence": result["confidence"],
+    }
+    return serializer.dumps(state)
+
+
+def decode_state_token(token: str) -> dict:
+    """Verify and decode a state token.
+
+    Args:
+        token: State token of a previous optimizer result.
+
+    Returns:
+        See this module's docstring.
+
+    Raises:
+        API_400_INVALID_STATE_TOKEN: The token is not valid or of another STATE_VERSION.
+    """
+    serializer = __serializer()
+    if serializer is None:
+        raise API_400_INVALID_STATE_TOKEN
+    try:
+        state = serializer.loads(token)
+    except BadSignature:
+        raise API_400_INVALID_STATE_TOKEN
+    if not isinstance(state, dict) or state.get("v") != STATE_VERSION:
+        raise API_400_INVALID_STATE_TOKEN
+    return state
+
+
+def __serializer() -> URLSafeSerializer | None:
+    """Token serializer of the configured secret key, None if not configured."""
+    secret_key = os.getenv("session_secret_key")
+    return URLSafeSerializer(secret_key, salt=__SALT) if secret_key else None
@@ -0,0 +1,139 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compiled restriction index module.
+
+Every restriction value is interned per restriction type into a bit index, so a list of restriction
+values becomes a single python int bitmask. A Course's restrictions are compiled once (cached by
+course_data_id) and a request's restrictions_met is compiled once per request, checking a Course
+is then a few integer mask operations per restriction type.
+
+Notes:
+    compiled restrictions: Tuple of (restriction type, singular condition, values bitmask) per
+        restriction type of a Course.
+
+    compiled restrictions_met: Dictionary of restriction type -> met values bitmask. Values never
+        seen on any Course can't be required by one, they are ignored and never interned.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from py_core.classes.course_class import Course
+
+# Restrictions langauge processing, The following condition string(s) is/are hardcoded (obviously)
+# and based of previous understood example(s).
+# TODO(Daniel): Hardcoded assumption code:
+SINGULAR_CONDITION = "one of"
+
+COMPILED_CACHE_SIZE = 100_000  # Maximum number of cached compiled Course restrictions.
+
+__VALUE_BITS: dict[str, dict] = {}  # Restriction type -> (value key -> bit index).
+__COMPILED_CACHE: OrderedDict[int, tuple] = OrderedDict()
+__LOCK = threading.Lock()
+
+
+def compile_course_restrictions(course: Course) -> tuple[tuple[str, bool, int], ...]:
+    """Compile a Course's restrictions, cached by course_data_id.
+
+    Args:
+        course: Course object to compile the restrictions of.
+
+    Returns:
+        See this module's docstring.
+    """
+    with __LOCK:
+        if course.course_data_id is not None:
+            compiled = __COMPILED_CACHE.get(course.course_data_id)
+            if compiled is not None:
+                __COMPILED_CACHE.move_to_end(course.course_data_id)
+                return compiled
+
+        compiled = []
+        for r_type, r_list in (course.restrictions or {}).items():
+            value_bits = __VALUE_BITS.setdefault(r_type, {})
+            mask = 0
+            for r_value in r_list:
+                bit = value_bits.setdefault(__value_key(r_value), len(value_bits))
+                mask |= 1 << bit
+            compiled.append((r_type, SINGULAR_CONDITION.lower() in r_type.lower(), mask))
+        compiled = tuple(compiled)
+
+        if course.course_data_id is not None:
+            __COMPILED_CACHE[course.course_data_id] = compiled
+            if len(__COMPILED_CACHE) > COMPILED_CACHE_SIZE:
+                __COMPILED_CACHE.popitem(last=False)
+    return compiled
+
+
+def compile_restrictions_met(restrictions_met: dict) -> dict[str, int]:
+    """Compile the restrictions met by a user.
+
+    Values not interned yet are ignored, compile the restrictions of the Courses to check first.
+
+    Args:
+        restrictions_met: Dictionary of restriction type -> list of restriction values met.
+
+    Returns:
+        See this module's docstring.
+    """
+    if not isinstance(restrictions_met, dict):
+        raise TypeError(f"restrictions_met expected {dict}, received {type(restrictions_met)}")
+
+    compiled = {}
+    with __LOCK:
+        for r_type, r_list in restrictions_met.items():
+            value_bits = __VALUE_BITS.get(r_type, {})
+            mask = 0
+            for r_value in r_list:
+                bit = value_bits.get(__value_key(r_value))
+                if bit is not None:
+                    mask |= 1 << bit
+            compiled[r_type] = mask
+    return compiled
+
+
+def restrictions_satisfied(
+    course_restrictions: tuple[tuple[str, bool, int], ...], restrictions_met: dict[str, int]
+) -> bool:
+    """Check if the restrictions met satisfy all the restrictions of a Course.
+
+    Args:
+        course_restrictions: Compiled restrictions of the Course.
+        restrictions_met: Compiled restrictions met.
+
+    Returns:
+        True of all restrictions are met, False if not met.
+    """
+    for r_type, singular, mask in course_restrictions:
+        met_mask = restrictions_met.get(r_type)
+        if met_mask is None:  # Matching type not found.
+            return False
+        if singular:
+            if not mask & met_mask:  # At least one of the values must be met.
+                return False
+        elif mask & ~met_mask:  # All values must be met.
+            return False
+    return True
+
+
+def __value_key(r_value):
+    """Hashable key of a restriction value, unhashable values use their canonical JSON."""
+    try:
+        hash(r_value)
+    except TypeError:
+        return json.dumps(r_value, sort_keys=True, default=str)
+    return r_value
@@ -16,17 +16,20 @@
 """Calendar export / download API endpoint routes."""
 
 from datetime import datetime
+from typing import Callable
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from starlette.background import BackgroundTask
 
 from app import general_exceptions
+from app.async_db import fetch_courses
 from app.cache_path_manipulation import remove_file_path
+from app.conditional import cache_headers, courses_etag, is_not_modified, not_modified_response
+from app.constants import EXPORT_CACHE_CONTROL
 from app.export.ics_manipulation import create_ics_calendar
 from app.export.notion_csv_manipulation import create_notion_csv
-from py_core.course import get_courses_via
 from py_core.logging_util import log_endpoint
 
 router = APIRouter(prefix="/download", tags=["download"])
@@ -37,7 +40,7 @@ class RequestDownloadCourses(BaseModel):
 
 
 @router.post("/ics/courses")
-async def courses_download(r: Request, r_model: RequestDownloadCourses) -> FileResponse:
+async def courses_download(r: Request, r_model: RequestDownloadCourses) -> Response:
     """Download ics file based on given course_data_ids.
 
     Args:
@@ -47,34 +50,28 @@ async def courses_download(r: Request, r_model: RequestDownloadCourses) -> FileR
     Returns:
         Download for the created ics calendar file.
     """
-    try:
-        if not r_model.course_data_ids:
-            raise general_exceptions.API_400_COURSE_DATA_IDS_UNSPECIFIED
-        courses = get_courses_via(course_data_id_list=r_model.course_data_ids)
-        if not courses:
-            raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
-        file_path = create_ics_calendar(source_list=courses)
-    except HTTPException as h:
-        log_endpoint(h, r, f"detail={h.detail} r_model={r_model}")
-        raise h
-    except Exception as e:  # All other python errors are cast and logged as 500.
-        h = general_exceptions.API_500_ERROR
-        log_endpoint(h, r, f"detail={h.detail} e={e} r_model={r_model}")
-        raise h
+    return await __download(r, r_model.course_data_ids, create_ics_calendar, "ics", "text/calendar")
 
-    h = FileResponse(
-        status_code=200,
-        path=file_path,
-        filename=f"courses_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.ics",
-        media_type="text/calendar",
-        background=BackgroundTask(remove_file_path, file_path),
+
+@router.get("/ics/courses")
+async def courses_download_get(r: Request, course_data_ids: list[int] = Query([])) -> Response:
+    """Conditional GET variant of POST /download/ics/courses.
+
+    Args:
+        r: fastapi.Request object.
+        course_data_ids: Requested course_data_ids.
+
+    Returns:
+        Download for the created ics calendar file, or an empty 304 if If-None-Match matches the
+        ETag of the courses.
+    """
+    return await __download(
+        r, course_data_ids, create_ics_calendar, "ics", "text/calendar", conditional=True
     )
-    log_endpoint(h, r, f"r_model={r_model}")
-    return h
 
 
 @router.post("/csv/courses")
-async def notion_courses_download(r: Request, r_model: RequestDownloadCourses) -> FileResponse:
+async def notion_courses_download(r: Request, r_model: RequestDownloadCourses) -> Response:
     """Download Notion csv file based on given course_data_ids.
 
     Args:
@@ -84,27 +81,81 @@ async def notion_courses_download(r: Request, r_model: RequestDownloadCourses) -
     Returns:
         Download for the created ics calendar file.
     """
+    return await __download(r, r_model.course_data_ids, create_notion_csv, "csv", "text/csv")
+
+
+@router.get("/csv/courses")
+async def notion_courses_download_get(
+    r: Request, course_data_ids: list[int] = Query([])
+) -> Response:
+    """Conditional GET variant of POST /download/csv/courses.
+
+    Args:
+        r: fastapi.Request object.
+        course_data_ids: Requested course_data_ids.
+
+    Returns:
+        Download for the created Notion csv file, or an empty 304 if If-None-Match matches the
+        ETag of the courses.
+    """
+    return await __download(
+        r, course_data_ids, create_notion_csv, "csv", "text/csv", conditional=True
+    )
+
+
+async def __download(
+    r: Request,
+    course_data_ids: list[int],
+    create: Callable,
+    extension: str,
+    media_type: str,
+    conditional: bool = False,
+) -> Response:
+    """Create and download the calendar file of course_data_ids.
+
+    Args:
+        r: fastapi.Request object.
+        course_data_ids: Requested course_data_ids.
+        create: Calendar file creation function, given the Courses and returning the file path.
+        extension: File extension of the download.
+        media_type: Media type of the download.
+        conditional: Answer with caching headers, and an empty 304 if the client's copy is current.
+
+    Returns:
+        Download for the created calendar file.
+    """
+    r_model = f"course_data_ids={course_data_ids}"
+    headers = None
     try:
-        if not r_model.course_data_ids:
+        if not course_data_ids:
             raise general_exceptions.API_400_COURSE_DATA_IDS_UNSPECIFIED
-        courses = get_courses_via(course_data_id_list=r_model.course_data_ids)
+        courses = await fetch_courses(course_data_id_list=course_data_ids)
         if not courses:
             raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
-        file_path = create_notion_csv(source_list=courses)
+        if conditional:
+            # The file is generated from the Courses only, decided before generating it.
+            etag = courses_etag(r.url.path, courses)
+            if is_not_modified(r, etag):
+                h = not_modified_response(etag, EXPORT_CACHE_CONTROL)
+                log_endpoint(h, r, r_model)
+                return h
+            headers = cache_headers(etag, EXPORT_CACHE_CONTROL)
+        file_path = create(source_list=courses)
     except HTTPException as h:
-        log_endpoint(h, r, f"detail={h.detail} r_model={r_model}")
+        log_endpoint(h, r, f"detail={h.detail} {r_model}")
         raise h
     except Exception as e:  # All other python errors are cast and logged as 500.
         h = general_exceptions.API_500_ERROR
-        log_endpoint(h, r, f"detail={h.detail} e={e} r_model={r_model}")
+        log_endpoint(h, r, f"detail={h.detail} e={e} {r_model}")
         raise h
 
     h = FileResponse(
         status_code=200,
         path=file_path,
-        filename=f"courses_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.csv",
-        media_type="text/csv",
+        headers=headers,  # Replaces FileResponse's file stat based ETag.
+        filename=f"courses_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.{extension}",
+        media_type=media_type,
         background=BackgroundTask(remove_file_path, file_path),
     )
-    log_endpoint(h, r, f"r_model={r_model}")
+    log_endpoint(h, r, r_model)
     return h
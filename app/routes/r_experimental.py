@@ -15,12 +15,20 @@
 
 """"Experimental endpoints."""
 
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from pydantic import BaseModel
 
 from app import general_exceptions
-from py_core.classes.course_class import course_to_extended_meetings
-from py_core.course import get_courses_via
+from app.async_db import fetch_courses
+from app.conditional import (
+    conditional_json_response,
+    courses_etag,
+    is_not_modified,
+    json_body,
+    not_modified_response,
+)
+from app.constants import EVENTS_CACHE_CONTROL
+from py_core.classes.course_class import Course, course_to_extended_meetings
 from py_core.classes.extended_meeting_class import http_format
 
 router = APIRouter(prefix="/experimental", tags=["experimental"])
@@ -42,15 +50,52 @@ async def events_example(r: Request, r_model: RequestEvents):
     Returns:
         Download for the created ics calendar file.
     """
+    courses = await __fetch_event_courses(r_model.course_data_ids, r_model.course_ids)
+    # TODO: LOG
+    #  new_log(http_ref=200, request_model=r_model, request=r)  # Log success.
+
+    return HTTPException(status.HTTP_200_OK, http_format(course_to_extended_meetings(courses)))
+
+
+@router.get("/events")
+async def events_example_get(
+    r: Request, course_data_ids: list[int] = Query([]), course_ids: list[int] = Query([])
+):
+    """Conditional GET variant of POST /experimental/events.
+
+    Args:
+        r: fastapi.Request object.
+        course_data_ids: Requested course_data_ids.
+        course_ids: Requested course_ids.
+
+    Returns:
+        The events of the courses, or an empty 304 if If-None-Match matches the ETag of the courses.
+    """
+    courses = await __fetch_event_courses(course_data_ids, course_ids)
+    # The events are generated from the Courses only, decided before generating them.
+    etag = courses_etag(r.url.path, courses)
+    if is_not_modified(r, etag):
+        return not_modified_response(etag, EVENTS_CACHE_CONTROL)
+    body = json_body(
+        HTTPException(status.HTTP_200_OK, http_format(course_to_extended_meetings(courses)))
+    )
+    return conditional_json_response(r, body, cache_control=EVENTS_CACHE_CONTROL, etag=etag)
+
+
+async def __fetch_event_courses(course_data_ids: list[int], course_ids: list[int]) -> list[Course]:
+    """Fetch the Courses of an events request.
+
+    Args:
+        course_data_ids: Requested course_data_ids.
+        course_ids: Requested course_ids.
+
+    Returns:
+        List of Course objects.
+    """
     try:
-        if not r_model.course_data_ids:
+        if not course_data_ids:
             raise general_exceptions.API_400_COURSE_DATA_IDS_UNSPECIFIED
-        ex_mts = course_to_extended_meetings(
-            get_courses_via(
-                course_data_id_list=r_model.course_data_ids,
-                course_id_list=r_model.course_ids,
-            )
-        )
+        return await fetch_courses(course_data_id_list=course_data_ids, course_id_list=course_ids)
     except HTTPException as h:
         # TODO: LOG
         #  new_log(http_ref=h, request_model=r_model, request=r)  # Log error.
@@ -61,7 +106,3 @@ async def events_example(r: Request, r_model: RequestEvents):
         # TODO: LOG
         #  new_log(http_ref=h, request_model=r_model, request=r)  # Log error.
         raise h
-    # TODO: LOG
-    #  new_log(http_ref=200, request_model=r_model, request=r)  # Log success.
-
-    return HTTPException(status.HTTP_200_OK, http_format(ex_mts))
@@ -16,19 +16,25 @@
 """"Experimental endpoints."""
 
 import datetime as dt
+import logging
 from enum import Enum
 
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel
+from sqlalchemy import select
 
+from app import auth, general_exceptions
+from app.async_db import fetch_all
+from app.conditional import conditional_json_response, content_etag, json_body
+from app.constants import EVENTS_CACHE_CONTROL
+from app.single_flight import SingleFlight
 from py_core.classes.extended_meeting_class import ExtendedMeeting
 from py_core.classes.extended_meeting_class import http_format
+from py_core.classes.user_classes import BasicUser
 from py_core.logging_util import log_endpoint
 
 # BAD PRACTICE CODE CALLS
 from datetime import date
-from py_core.db import SessionObj
-from py_core.db import db_globals as DG
 from py_core.db import db_tables as DT
 
 router = APIRouter(prefix="/fyic2023", tags=["fyic2023"])
@@ -44,6 +50,19 @@ class ConferenceInfoStream(BaseModel):
     stream: ConferenceStream
 
 
+GENERAL_COLOUR = 1  # Event colour of the general events, part of every stream.
+STREAM_COLOURS = {
+    ConferenceStream.Leadership: 3,
+    ConferenceStream.Sustainability: 4,
+    ConferenceStream.Vpx: 5,
+}
+
+# Preloaded (JSON body, ETag) and number of events per stream, see load_fyic_events().
+__payloads: dict[ConferenceStream, tuple[bytes, str]] | None = None
+__event_counts: dict[ConferenceStream, int] = {}
+__LOADS = SingleFlight()  # Concurrent (re)loads share a single query.
+
+
 # FYIC Events
 """
 general_events = [
@@ -695,53 +714,30 @@ stream3_events = [
 
 # ########## START OF BAD PRACTICE CODE / PATCH ##########
 # THIS IS BAD PRACTICE, URGENT PATCH FOR FYIC DUE TO RELATED EFFECTS OF py_core ISSUE #13.
-# CODE BASED OFF def get_users_via( ... IN py_core user.py.
-def get_fyic_events_via_colour(colour: list[int] | None = None) -> list[ExtendedMeeting]:
-    if colour is None or not colour:
-        return []
-
-    session: SessionObj
-    try:
-        with DG.Session.begin() as session:
-            result = session.query(DT.TBL_Event).filter(
-                DT.TBL_Event.color.in_(colour),
-            )
-            return [
-                ExtendedMeeting(
-                    time_start=r.begin_time,
-                    time_end=r.end_time,
-                    date_start=r.started_at,
-                    date_end=r.ended_at,
-                    timezone_str=r.timezone,
-                    occurrence_unit=r.occurrence_unit,
-                    occurrence_interval=r.occurrence_interval,
-                    occurrence_limit=(
-                        r.occurrence_until
-                        if isinstance(r.occurrence_until, date)
-                        else r.occurrence_repeat  # int based limit.
-                    ),
-                    days_of_week=r.days_of_week,
-                    location=r.location,
-                    name=r.name,
-                    description=r.description,
-                    seats_filled=r.seats_filled,
-                    max_capacity=r.max_capacity,
-                    is_virtual=r.is_virtual,
-                    colour=None,  # Override colour (due to pycore issue #13).
-                )
-                for r in result
-            ]
-    except AttributeError as e:
-        msg = e.args[0]
-        if "'NoneType' object has no attribute 'begin'" in msg:
-            raise RuntimeWarning(
-                f"{msg} <--- Daniel: Check (local / ssh) connection to DB, possible missing "
-                f"init_database() call via 'from py_core.db import init_database'"
-            )
-        else:
-            raise e
-    except Exception as e:
-        raise e
+def __event_to_meeting(r) -> ExtendedMeeting:
+    """Convert a DT.TBL_Event row to an ExtendedMeeting."""
+    return ExtendedMeeting(
+        time_start=r.begin_time,
+        time_end=r.end_time,
+        date_start=r.started_at,
+        date_end=r.ended_at,
+        timezone_str=r.timezone,
+        occurrence_unit=r.occurrence_unit,
+        occurrence_interval=r.occurrence_interval,
+        occurrence_limit=(
+            r.occurrence_until
+            if isinstance(r.occurrence_until, date)
+            else r.occurrence_repeat  # int based limit.
+        ),
+        days_of_week=r.days_of_week,
+        location=r.location,
+        name=r.name,
+        description=r.description,
+        seats_filled=r.seats_filled,
+        max_capacity=r.max_capacity,
+        is_virtual=r.is_virtual,
+        colour=None,  # Override colour (due to pycore issue #13).
+    )
 
 
 # ########## END OF BAD PRACTICE CODE / PATCH ##########
@@ -749,17 +745,114 @@ def get_fyic_events_via_colour(colour: list[int] | None = None) -> list[Extended
 
 @router.post("/events")
 async def events(r: Request, r_model: ConferenceInfoStream):
-    general_events = get_fyic_events_via_colour([1])
-    all_events = general_events.copy()
-
-    if r_model.stream == ConferenceStream.Vpx:
-        all_events += get_fyic_events_via_colour([5])
-    elif r_model.stream == ConferenceStream.Sustainability:
-        all_events += get_fyic_events_via_colour([4])
-    else:  # r_model.stream == ConferenceStream.Leadership
-        all_events += get_fyic_events_via_colour([3])
-
-    formatted = http_format(all_events)
-    h = HTTPException(status.HTTP_200_OK, formatted)
+    """Get the general and stream events of a conference stream.
+
+    The serialized events of every stream are preloaded, see load_fyic_events().
+
+    Args:
+        r: fastapi.Request object.
+        r_model: ConferenceInfoStream request model object.
+
+    Returns:
+        The events, with a strong ETag of the payload.
+    """
+    body, etag = await __stream_payload(r_model.stream)
+    h = Response(content=body, media_type="application/json", headers={"ETag": etag})
     log_endpoint(h, r)
-    return HTTPException(status.HTTP_200_OK, formatted)
+    return h
+
+
+@router.get("/events")
+async def events_get(r: Request, stream: ConferenceStream):
+    """Conditional GET variant of POST /fyic2023/events.
+
+    Args:
+        r: fastapi.Request object.
+        stream: Conference stream.
+
+    Returns:
+        The events, or an empty 304 if If-None-Match matches their ETag.
+    """
+    body, etag = await __stream_payload(stream)
+    h = conditional_json_response(r, body, cache_control=EVENTS_CACHE_CONTROL, etag=etag)
+    log_endpoint(h, r)
+    return h
+
+
+@router.post("/events/refresh")
+async def events_refresh(r: Request, user: BasicUser = Depends(auth.MANAGER)):
+    """Reload the preloaded events of every stream, admin only (see auth.is_admin()).
+
+    Args:
+        r: fastapi.Request object.
+        user: Logged-in user.
+
+    Returns:
+        Number of events and ETag per stream.
+    """
+    try:
+        if user is None:
+            raise general_exceptions.API_401_UNAUTHORIZED_USER
+        if not auth.is_admin(user):
+            raise general_exceptions.API_403_FORBIDDEN_USER
+        await __LOADS.do("events", load_fyic_events)
+    except HTTPException as h:
+        log_endpoint(h, r, f"detail={h.detail}")
+        raise h
+    except Exception as e:  # All other python errors are cast and logged as 500.
+        h = general_exceptions.API_500_ERROR
+        log_endpoint(h, r, f"detail={h.detail} e={e}")
+        raise h
+    h = HTTPException(
+        status_code=status.HTTP_200_OK,
+        detail={
+            stream.value: {"events": count, "etag": __payloads[stream][1]}
+            for stream, count in __event_counts.items()
+        },
+    )
+    log_endpoint(h, r, f"user={user.username}")
+    raise h
+
+
+async def load_fyic_events():
+    """Load the events of every colour in one query and serialize every stream's payload.
+
+    Payloads keep the original response format, a serialized 200 HTTPException of the general
+    events followed by the stream's events.
+    """
+    global __payloads, __event_counts
+
+    colours = [GENERAL_COLOUR, *STREAM_COLOURS.values()]
+    rows = await fetch_all(
+        select(DT.TBL_Event).where(DT.TBL_Event.color.in_(colours)),
+        convert=lambda row: (row.color, __event_to_meeting(row)),
+    )
+    by_colour = {colour: [] for colour in colours}
+    for colour, meeting in rows:
+        by_colour[colour].append(meeting)
+
+    payloads, event_counts = {}, {}
+    for stream, colour in STREAM_COLOURS.items():
+        all_events = by_colour[GENERAL_COLOUR] + by_colour[colour]
+        body = json_body(HTTPException(status.HTTP_200_OK, http_format(all_events)))
+        payloads[stream] = (body, content_etag(body))
+        event_counts[stream] = len(all_events)
+    __payloads, __event_counts = payloads, event_counts
+    logging.info(f"Loaded FYIC events {event_counts}")
+
+
+async def __stream_payload(stream: ConferenceStream) -> tuple[bytes, str]:
+    """Get the preloaded (JSON body, ETag) of a stream.
+    Loaded on first use if the preload failed.
+    """
+    if __payloads is None:
+        await __LOADS.do("events", load_fyic_events)
+    return __payloads[stream]
+
+
+async def preload_fyic_events():
+    """Startup event handler, see load_fyic_events()."""
+    try:
+        await load_fyic_events()
+    except Exception as e:  # Loaded on first use instead.
+        logging.error(f"Cannot preload FYIC events: {e}")
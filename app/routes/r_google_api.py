@@ -26,8 +26,8 @@ from google_auth_oauthlib.flow import Flow
 from pydantic import BaseModel
 
 from app import general_exceptions
+from app.catalog_snapshot import get_catalog_courses
 from app.export.gcal_json_manipulation import get_gcal_event_jsons
-from py_core.course import get_courses_via
 
 logger = logging.getLogger(__name__)
 
@@ -93,7 +93,7 @@ if State.GOOGLE_API_AVAILABLE:
 
         if not r_model.course_data_ids:
             raise general_exceptions.API_400_COURSE_DATA_IDS_UNSPECIFIED
-        courses = get_courses_via(course_data_id_list=r_model.course_data_ids)
+        courses = get_catalog_courses(course_data_id_list=r_model.course_data_ids)
         if not courses:
             raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
 
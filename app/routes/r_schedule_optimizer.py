@@ -15,18 +15,47 @@
 
 """Schedule optimizer API endpoint routes."""
 
-from fastapi import APIRouter, HTTPException, Request, status
-from pydantic import BaseModel
+import asyncio
+import json
+import queue
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, conlist, validator
 
 from app import general_exceptions
-from app.schedule_optimizer import course_level_optimizer
+from app.catalog_snapshot import get_catalog_courses
+from app.optimizer_cache import RESULT_CACHE, request_fingerprint, seat_signature
+from app.optimizer_pool import (
+    API_499_CLIENT_DISCONNECTED,
+    DISCONNECT_POLL_S,
+    get_manager,
+    get_pool,
+    optimizer_timeout_s,
+    pool_status,
+    run_in_pool,
+)
+from app.optimizer_state import decode_state_token, encode_state_token
+from app.schedule_optimizer import OptimizerSolver, course_level_optimizer, course_level_top_k
+from app.single_flight import SingleFlight
+from py_core.classes.course_class import Course
 from py_core.classes.extended_meeting_class import http_format
 from py_core.classes.optimizer_criteria_class import CourseOptimizerCriteria
-from py_core.course import get_courses_via
 from py_core.logging_util import log_endpoint
 
 router = APIRouter(prefix="/optimizer", tags=["optimizer"])
 
+MAX_TOP_K = 10  # Maximum number of schedules returned by the top-k endpoint.
+MAX_BATCH_JOBS = 500  # Maximum number of optimizer requests per batch.
+
+# Identical concurrent optimizer runs, a disconnected leader's followers run it again.
+__FLIGHTS = SingleFlight(
+    retry_if=lambda e: isinstance(e, HTTPException)
+    and e.status_code == API_499_CLIENT_DISCONNECTED.status_code
+)
+
 
 class RequestScheduleOptimizer(BaseModel):
     """Request body for optimizer endpoint.
@@ -39,6 +68,16 @@ class RequestScheduleOptimizer(BaseModel):
     ensure_restrictions_met: Optional condition, if ensure_restrictions_met is True, schedule will
         only build if courses have all their restrictions met, default is False.
     restrictions_met: Optional condition, Dictionary of course restrictions met by the user.
+    solver: Optional condition, "greedy" (default) for the fast heuristic search, "exact" for the
+        provably best total rating.
+    deadline_ms: Optional condition, time budget in milliseconds, capped at the optimizer timeout.
+        When it runs out, the best schedule found so far is returned with the confidence achieved,
+        default is None (no budget besides the optimizer timeout).
+    state_token: Optional condition, state_token of a previous result to warm start from, only the
+        requirements affected by the changes since are optimized again. course_ids default to the
+        previous result's course_ids.
+    add_course_ids: Optional condition, course_ids to add to the course_ids.
+    remove_course_ids: Optional condition, course_ids to remove from the course_ids.
     """
 
     course_ids: list[int] = []
@@ -47,6 +86,26 @@ class RequestScheduleOptimizer(BaseModel):
     ensure_open_seats: bool = True
     ensure_restrictions_met: bool = False
     restrictions_met: dict = None
+    solver: OptimizerSolver = OptimizerSolver.Greedy
+    deadline_ms: int = Field(default=None, ge=1)
+    state_token: str = None
+    add_course_ids: list[int] = []
+    remove_course_ids: list[int] = []
+
+    @validator("deadline_ms")
+    def cap_deadline_ms(cls, deadline_ms: int | None) -> int | None:
+        if deadline_ms is None:
+            return None
+        return min(deadline_ms, int(optimizer_timeout_s() * 1000))
+
+
+class RequestScheduleOptimizerBatch(BaseModel):
+    """Request body for batch optimizer endpoint.
+
+    jobs: List of optimizer requests, each is optimized on its own.
+    """
+
+    jobs: conlist(RequestScheduleOptimizer, min_items=1, max_items=MAX_BATCH_JOBS)
 
 
 class RequestRestrictions(BaseModel):
@@ -72,26 +131,8 @@ async def schedule_optimizer(r: Request, r_model: RequestScheduleOptimizer):
         Download for the created ics calendar file.
     """
     try:
-        # Process course_ids.
-        if not r_model.course_ids:
-            raise general_exceptions.API_400_COURSE_IDS_UNSPECIFIED
-        courses = get_courses_via(course_id_list=r_model.course_ids)
-        if not courses:
-            raise general_exceptions.API_404_COURSE_IDS_NOT_FOUND
-        # Process required course_data_ids.
-        required_courses = get_courses_via(course_data_id_list=r_model.required_course_data_ids)
-        if r_model.required_course_data_ids and not required_courses:
-            raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
-        # Optimize.
-        result = course_level_optimizer(
-            options=courses,
-            criteria=r_model.optimizer_criteria,
-            required_courses=required_courses,
-            ensure_open_seats=r_model.ensure_open_seats,
-            ensure_restrictions_met=r_model.ensure_restrictions_met,
-            restrictions_met=r_model.restrictions_met,
-        )
-        result["schedule"] = http_format(result["schedule"])  # Convert for HTTP safe raise.
+        courses, required_courses = await run_in_threadpool(__get_courses, r_model)
+        result = await __optimize(r, r_model, courses, required_courses)
     except HTTPException as h:
         log_endpoint(h, r, f"detail={h.detail} r_model={r_model}")
         raise h
@@ -102,3 +143,399 @@ async def schedule_optimizer(r: Request, r_model: RequestScheduleOptimizer):
     h = HTTPException(status_code=status.HTTP_200_OK, detail=result)
     log_endpoint(h, r, f"r_model={r_model}")
     raise h
+
+
+@router.post("/schedule/stream")
+async def schedule_optimizer_stream(
+    r: Request, r_model: RequestScheduleOptimizer
+) -> StreamingResponse:
+    """Optimize a schedule, streaming every improved schedule found as Server-Sent Events.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizer request model object.
+
+    Returns:
+        text/event-stream of "progress" events, each an improved schedule (same format as
+        /optimizer/schedule) found so far, then a single "result" event of the final result or an
+        "error" event of the error's "status_code" and "detail".
+    """
+    try:
+        courses, required_courses = await run_in_threadpool(__get_courses, r_model)
+    except HTTPException as h:
+        log_endpoint(h, r, f"detail={h.detail} r_model={r_model}")
+        raise h
+    except Exception as e:  # All other python errors are cast and logged as 500.
+        h = general_exceptions.API_500_ERROR
+        log_endpoint(h, r, f"detail={h.detail} e={e} r_model={r_model}")
+        raise h
+
+    h = StreamingResponse(
+        __stream_progress(r, r_model, courses, required_courses),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    log_endpoint(h, r, f"r_model={r_model}")
+    return h
+
+
+@router.post("/schedules")
+async def schedules_top_k(
+    r: Request, r_model: RequestScheduleOptimizer, k: int = Query(default=5, ge=1, le=MAX_TOP_K)
+):
+    """Get the k best distinct time valid schedules from a single search.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizer request model object, solver is ignored.
+        k: Maximum number of schedules to return.
+
+    Returns:
+        The schedules <total rating high to low>, each in the same format as /optimizer/schedule.
+    """
+    try:
+        courses, required_courses = await run_in_threadpool(__get_courses, r_model)
+        fingerprint = request_fingerprint("schedules", r_model, k=k)
+        signature = seat_signature(courses + required_courses)
+        result = RESULT_CACHE.get(fingerprint, signature)
+        if result is None:
+            # Optimize.
+            result = await run_in_pool(
+                r,
+                course_level_top_k,
+                options=courses,
+                criteria=r_model.optimizer_criteria,
+                k=k,
+                required_courses=required_courses,
+                ensure_open_seats=r_model.ensure_open_seats,
+                ensure_restrictions_met=r_model.ensure_restrictions_met,
+                restrictions_met=r_model.restrictions_met,
+                deadline_ms=r_model.deadline_ms,
+            )
+            for schedule_result in result["schedules"]:
+                schedule_result["schedule"] = http_format(schedule_result["schedule"])
+            RESULT_CACHE.put(fingerprint, signature, result)
+    except HTTPException as h:
+        log_endpoint(h, r, f"detail={h.detail} k={k} r_model={r_model}")
+        raise h
+    except Exception as e:  # All other python errors are cast and logged as 500.
+        h = general_exceptions.API_500_ERROR
+        log_endpoint(h, r, f"detail={h.detail} e={e} k={k} r_model={r_model}")
+        raise h
+    h = HTTPException(status_code=status.HTTP_200_OK, detail=result)
+    log_endpoint(h, r, f"k={k} r_model={r_model}")
+    raise h
+
+
+@router.post("/batch")
+async def schedule_optimizer_batch(
+    r: Request, r_model: RequestScheduleOptimizerBatch
+) -> StreamingResponse:
+    """Optimize many schedules at once, for example a whole cohort of students.
+
+    The Courses of all jobs are fetched at once, jobs then run in parallel in the optimizer pool.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizerBatch request model object.
+
+    Returns:
+        NDJSON stream of one line per job, in order of completion. Each line is a JSON object of the
+        job's "index" within r_model.jobs, its "status_code" and its "detail" (the same result or
+        error detail as /optimizer/schedule).
+    """
+    try:
+        courses_by_id, required_by_id = await run_in_threadpool(__get_batch_courses, r_model)
+    except HTTPException as h:
+        log_endpoint(h, r, f"detail={h.detail} jobs={len(r_model.jobs)}")
+        raise h
+    except Exception as e:  # All other python errors are cast and logged as 500.
+        h = general_exceptions.API_500_ERROR
+        log_endpoint(h, r, f"detail={h.detail} e={e} jobs={len(r_model.jobs)}")
+        raise h
+
+    h = StreamingResponse(
+        __stream_batch(r, r_model, courses_by_id, required_by_id),
+        media_type="application/x-ndjson",
+    )
+    log_endpoint(h, r, f"jobs={len(r_model.jobs)}")
+    return h
+
+
+@router.get("/pool")
+async def optimizer_pool_status(r: Request):
+    """Get the optimizer process pool status, including its current queue depth.
+
+    Args:
+        r: fastapi.Request object.
+    """
+    raise HTTPException(status_code=status.HTTP_200_OK, detail=pool_status())
+
+
+@router.get("/cache")
+async def optimizer_cache_status(r: Request):
+    """Get the optimizer result cache statistics.
+
+    Args:
+        r: fastapi.Request object.
+    """
+    raise HTTPException(status_code=status.HTTP_200_OK, detail=RESULT_CACHE.stats())
+
+
+async def __optimize(
+    r: Request,
+    r_model: RequestScheduleOptimizer,
+    courses: list[Course],
+    required_courses: list[Course],
+    on_progress=None,
+) -> dict:
+    """Get the (cached) optimizer result of an optimizer request.
+
+    Identical concurrent requests share a single optimizer run, except progress streams.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizer request model object.
+        courses: Option Courses of the request.
+        required_courses: Required Courses of the request.
+        on_progress: See course_level_optimizer(), not called for cached results.
+
+    Returns:
+        The HTTP safe optimizer result.
+    """
+    fingerprint = request_fingerprint("schedule", r_model)
+    signature = seat_signature(courses + required_courses)
+    result = RESULT_CACHE.get(fingerprint, signature)
+    if result is not None:
+        return result
+
+    async def run() -> dict:
+        result = await __run_optimizer(r, r_model, courses, required_courses, on_progress)
+        RESULT_CACHE.put(fingerprint, signature, result)
+        return result
+
+    if on_progress is not None:  # Progress is reported to this request only.
+        return await run()
+    return await __FLIGHTS.do((fingerprint, signature), run)
+
+
+async def __run_optimizer(
+    r: Request,
+    r_model: RequestScheduleOptimizer,
+    courses: list[Course],
+    required_courses: list[Course],
+    on_progress,
+) -> dict:
+    """Run an optimizer request in the optimizer pool, see __optimize()."""
+    state = decode_state_token(r_model.state_token) if r_model.state_token else {}
+    # Optimize.
+    result = await run_in_pool(
+        r,
+        course_level_optimizer,
+        options=courses,
+        criteria=r_model.optimizer_criteria,
+        required_courses=required_courses,
+        ensure_open_seats=r_model.ensure_open_seats,
+        ensure_restrictions_met=r_model.ensure_restrictions_met,
+        restrictions_met=r_model.restrictions_met,
+        solver=r_model.solver,
+        deadline_ms=r_model.deadline_ms,
+        on_progress=on_progress,
+        seed_course_data_ids=state.get("course_data_ids"),
+        seed_confidence=state.get("confidence", 1.0),
+    )
+    result["schedule"] = http_format(result["schedule"])  # Convert for HTTP safe raise.
+    result["state_token"] = encode_state_token(result, courses, required_courses)
+    return result
+
+
+async def __stream_batch(
+    r: Request,
+    r_model: RequestScheduleOptimizerBatch,
+    courses_by_id: dict[int, list[Course]],
+    required_by_id: dict[int, Course],
+):
+    """Run every job of a batch and yield their NDJSON lines as they finish.
+
+    At most as many jobs as the optimizer pool has workers are in flight at once, so queued jobs
+    don't use up their timeout waiting behind the rest of the batch.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizerBatch request model object.
+        courses_by_id: See __get_batch_courses().
+        required_by_id: See __get_batch_courses().
+
+    Yields:
+        One NDJSON line per job.
+    """
+    get_pool()
+    in_flight = asyncio.Semaphore(max(1, pool_status()["workers"]))
+
+    async def run_job(index: int, job: RequestScheduleOptimizer) -> dict:
+        async with in_flight:
+            try:
+                course_ids = __course_ids(job)
+                if not course_ids:
+                    raise general_exceptions.API_400_COURSE_IDS_UNSPECIFIED
+                courses = [c for i in course_ids for c in courses_by_id.get(i, [])]
+                if not courses:
+                    raise general_exceptions.API_404_COURSE_IDS_NOT_FOUND
+                required_courses = [
+                    required_by_id[i] for i in job.required_course_data_ids if i in required_by_id
+                ]
+                if job.required_course_data_ids and not required_courses:
+                    raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
+                result = await __optimize(r, job, courses, required_courses)
+            except HTTPException as h:
+                log_endpoint(h, r, f"detail={h.detail} index={index} r_model={job}")
+                return {"index": index, "status_code": h.status_code, "detail": h.detail}
+            except Exception as e:  # All other python errors are cast and logged as 500.
+                h = general_exceptions.API_500_ERROR
+                log_endpoint(h, r, f"detail={h.detail} e={e} index={index} r_model={job}")
+                return {"index": index, "status_code": h.status_code, "detail": h.detail}
+            return {"index": index, "status_code": status.HTTP_200_OK, "detail": result}
+
+    tasks = [asyncio.create_task(run_job(i, job)) for i, job in enumerate(r_model.jobs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if line["status_code"] == API_499_CLIENT_DISCONNECTED.status_code:
+                break  # Nobody is left to stream to.
+            yield json.dumps(jsonable_encoder(line)) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def __stream_progress(
+    r: Request,
+    r_model: RequestScheduleOptimizer,
+    courses: list[Course],
+    required_courses: list[Course],
+):
+    """Run an optimizer request and yield its progress and result as Server-Sent Events.
+
+    The optimizer runs in the optimizer pool and puts every improved schedule on a manager queue,
+    which is drained while the job runs.
+
+    Args:
+        r: fastapi.Request object.
+        r_model: RequestScheduleOptimizer request model object.
+        courses: Option Courses of the request.
+        required_courses: Required Courses of the request.
+
+    Yields:
+        Server-Sent Events.
+    """
+    progress = await run_in_threadpool(lambda: get_manager().Queue())  # May start the manager.
+    job = asyncio.ensure_future(
+        __optimize(r, r_model, courses, required_courses, on_progress=progress.put)
+    )
+    try:
+        while True:
+            done = job.done()  # Checked before draining, so no update put before the end is lost.
+            for update in await run_in_threadpool(__drain, progress):
+                update["schedule"] = http_format(update["schedule"])
+                yield __sse("progress", update)
+            if done:
+                break
+            await asyncio.wait({job}, timeout=DISCONNECT_POLL_S)
+        yield __sse("result", job.result())
+    except HTTPException as h:
+        if h.status_code == API_499_CLIENT_DISCONNECTED.status_code:
+            return  # Nobody is left to stream to.
+        log_endpoint(h, r, f"detail={h.detail} r_model={r_model}")
+        yield __sse("error", {"status_code": h.status_code, "detail": h.detail})
+    except Exception as e:  # All other python errors are cast and logged as 500.
+        h = general_exceptions.API_500_ERROR
+        log_endpoint(h, r, f"detail={h.detail} e={e} r_model={r_model}")
+        yield __sse("error", {"status_code": h.status_code, "detail": h.detail})
+    finally:
+        job.cancel()
+
+
+def __drain(progress) -> list:
+    """Get every item currently on a queue without blocking."""
+    items = []
+    while True:
+        try:
+            items.append(progress.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def __sse(event: str, data) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def __get_batch_courses(
+    r_model: RequestScheduleOptimizerBatch,
+) -> tuple[dict[int, list[Course]], dict[int, Course]]:
+    """Get the option and required Courses of every job of a batch with one fetch each.
+
+    Errors of a single job (for example an invalid state_token) are left to the job to report.
+
+    Args:
+        r_model: RequestScheduleOptimizerBatch request model object.
+
+    Returns:
+        Tuple of (course_id -> option Courses, course_data_id -> required Course).
+    """
+    course_ids = set()
+    for job in r_model.jobs:
+        try:
+            course_ids.update(__course_ids(job))
+        except HTTPException:
+            continue  # Raised again by the job itself.
+    courses_by_id = {}
+    if course_ids:
+        for course in get_catalog_courses(course_id_list=sorted(course_ids)):
+            courses_by_id.setdefault(course.course_id, []).append(course)
+
+    required_ids = sorted({i for job in r_model.jobs for i in job.required_course_data_ids})
+    required_by_id = {}
+    if required_ids:
+        for course in get_catalog_courses(course_data_id_list=required_ids):
+            required_by_id[course.course_data_id] = course
+    return courses_by_id, required_by_id
+
+
+def __get_courses(r_model: RequestScheduleOptimizer) -> tuple[list[Course], list[Course]]:
+    """Get the option and required Courses of an optimizer request.
+
+    Args:
+        r_model: RequestScheduleOptimizer request model object.
+
+    Returns:
+        Tuple of (option Courses, required Courses).
+    """
+    # Process course_ids.
+    course_ids = __course_ids(r_model)
+    if not course_ids:
+        raise general_exceptions.API_400_COURSE_IDS_UNSPECIFIED
+    courses = get_catalog_courses(course_id_list=course_ids)
+    if not courses:
+        raise general_exceptions.API_404_COURSE_IDS_NOT_FOUND
+    # Process required course_data_ids.
+    required_courses = get_catalog_courses(course_data_id_list=r_model.required_course_data_ids)
+    if r_model.required_course_data_ids and not required_courses:
+        raise general_exceptions.API_404_COURSE_DATA_IDS_NOT_FOUND
+    return courses, required_courses
+
+
+def __course_ids(r_model: RequestScheduleOptimizer) -> list[int]:
+    """Get the course_ids of an optimizer request, with its state_token changes applied.
+
+    Args:
+        r_model: RequestScheduleOptimizer request model object.
+
+    Returns:
+        Unique course_ids in request order.
+    """
+    course_ids = r_model.course_ids
+    if r_model.state_token and not course_ids:
+        course_ids = decode_state_token(r_model.state_token)["course_ids"]
+    removed = set(r_model.remove_course_ids)
+    return [i for i in dict.fromkeys(course_ids + r_model.add_course_ids) if i not in removed]
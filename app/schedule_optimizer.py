@@ -27,8 +27,9 @@ Notes:
         required courses. This variable could technically be replaced by the original
         required_courses, but by using a second variable it improves readability and future logic.
 
-    manifest: A list of strings. Each string represents an element that is required by the final
-        resulting schedule. These string values are generated by __get_manifest_value().
+    manifest: A dictionary of strings to slot ids. Each string represents an element that is
+        required by the final resulting schedule. These string values are generated by
+        __get_manifest_value(). Slot ids are dense (0 to len - 1) in order of first appearance.
 
         The manifest should not include strings representing courses specified as required_courses.
         Remember, the manifest specifies what still needs to be fulfilled. required_courses will be
@@ -39,7 +40,8 @@ Notes:
         Used for schedule build attempts as options are removed.
 
         options_2d is sorted <from index 0 to n> by 3 conditions:
-            1.  End time calculation, early end represented by datetime.timedelta()
+            1.  End time calculation, early end represented by an int (microseconds before the
+                end of the day).
                 <low/early to high/later>.
             2.  Length of time the first meeting runs <low/early to high/late>.
             3.  Rating <high to low>.
@@ -63,8 +65,9 @@ Notes:
         sublist, stored in a main list. The sublist are organized options according to manifest
         specifications.
 
-        Used for distributed lowest rated options removal. As options are removed, elements are
-        actually removed from the sub lists of options_3d.
+        Used for distributed lowest rated options removal. Options are never actually removed
+        from the sub lists of options_3d, a removal is described by the number of (highest rated)
+        options kept per sublist, see __distributed_lengths().
 
         options_3d is sorted <from index 0 to n> by 1 condition:
             1.  Number of options per sublist <low to high>.
@@ -97,11 +100,22 @@ Notes:
                     ],
                         ...
                 ]
+
+    sections: OptimizerSection records of the options_3d options, in options_2d order. Build
+        attempts and searches run on these records, see __generate_sections().
 """
 
+import hashlib
+import heapq
 import math
-from datetime import time, date, datetime, timedelta
-from itertools import chain
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import time
+from enum import Enum
+from itertools import chain, count
+from time import monotonic
+from typing import Callable
 
 from fastapi import HTTPException, status
 
@@ -112,6 +126,15 @@ from py_core.classes.course_class import (
 )
 from py_core.classes.optimizer_criteria_class import CourseOptimizerCriteria
 
+from app.conflict_graph import get_conflict_graph
+from app.optimizer_pool import API_503_OPTIMIZER_TIMEOUT
+from app.restriction_index import (
+    compile_course_restrictions,
+    compile_restrictions_met,
+    restrictions_satisfied,
+)
+from app.timetable_bitset import course_mask, conflicts_with_schedule
+
 # HTTPExceptions
 API_404_OPEN_SEATS_CONFLICT = HTTPException(
     status_code=status.HTTP_404_NOT_FOUND,
@@ -136,11 +159,55 @@ def API_400_REQUIRED_COURSES_CONFLICT(required_courses: list[Course]) -> HTTPExc
 
 
 MAX_OPTIMIZATION_ATTEMPTS = 10  # Optimizer constants.
+RATING_CACHE_SIZE = 50_000  # Maximum number of cached per-section ratings.
+MASK_CACHE_SIZE = 50_000  # Maximum number of cached per-section weekly timetable masks.
+
+# LRU caches shared across requests. Ratings are keyed by (section content digest, criteria hash),
+# weekly masks only depend on the meeting times and are keyed by them (see __meetings_key()), so an
+# edited section never reuses a rating or mask of its previous content.
+__RATING_CACHE: OrderedDict[tuple[bytes, str], float] = OrderedDict()
+__MASK_CACHE: OrderedDict[tuple, int] = OrderedDict()
+__CACHE_LOCK = threading.Lock()
+
+
+class OptimizerSolver(str, Enum):
+    """Optimizer solver modes.
+
+    Greedy: Greedy schedule builds within a binary search over the number of options removed.
+    Exact: Depth-first branch-and-bound search returning the provably best total rating.
+    """
 
-# Restrictions langauge processing, The following condition string(s) is/are hardcoded (obviously)
-# and based of previous understood example(s).
-# TODO(Daniel): Hardcoded assumption code:
-SINGULAR_CONDITION = "one of"
+    Greedy = "greedy"
+    Exact = "exact"
+
+
+class OptimizerSection:
+    """Compact record of a section (Course) option, built once per request.
+
+    Build attempts only read these records instead of the pydantic Course objects, the Course is
+    only read again to build the result.
+
+    Attributes:
+        course: The section's Course object.
+        slot: Index of the options_3d sublist (manifest requirement) the section fulfills, -1 for
+            initial_schedule Courses.
+        rank: Index of the section within its options_3d sublist.
+        rating: Evaluated rating of the section.
+        mask: See __conflict_data(), mask of the section.
+        row: Conflict graph row of the section, None if the conflict graph isn't used.
+    """
+
+    __slots__ = ("course", "slot", "rank", "rating", "mask", "row")
+
+    def __init__(
+        self, course: Course, slot: int, rank: int, rating: float, mask: int, row: int | None
+    ):
+        self.course = course
+        self.slot = slot
+        self.rank = rank
+        self.rating = rating
+        self.mask = mask
+        self.row = row
 
 
 def course_level_optimizer(
@@ -150,6 +217,11 @@ def course_level_optimizer(
     ensure_open_seats: bool = False,
     ensure_restrictions_met: bool = False,
     restrictions_met: dict = None,
+    solver: OptimizerSolver = OptimizerSolver.Greedy,
+    deadline_ms: int | None = None,
+    on_progress: Callable[[dict], None] | None = None,
+    seed_course_data_ids: list[int] = None,
+    seed_confidence: float = 1.0,
 ) -> (list[Course] | None, float):
     """Course level optimizer algorithm.
 
@@ -162,17 +234,39 @@ def course_level_optimizer(
         ensure_restrictions_met: Optional condition, if ensure_restrictions_met is True, schedule
             will only build if courses have all their restrictions met, default is False.
         restrictions_met: Optional condition, Dictionary of course restrictions met by the user.
+        solver: Optional condition, OptimizerSolver mode, default is OptimizerSolver.Greedy.
+        deadline_ms: Optional condition, time budget in milliseconds, default is None (no budget).
+            See Notes.
+        on_progress: Optional callback, called with every improved schedule found during the
+            search, formatted the same as the result. Must be picklable to run in the optimizer
+            pool, for example a multiprocessing Manager Queue's put method.
+        seed_course_data_ids: Optional condition, course_data_ids of a previous schedule result to
+            warm start from, default is None (cold start). See Notes.
+        seed_confidence: Optional condition, confidence of the previous schedule result, default
+            is 1.0.
 
     Notes:
         Courses in required_courses is the initial_schedule and thus overrules ensure_open_seats.
         This is a useful feature for when a student is registered for certain classes that are
         full, however they want to register for more courses.
 
+        With a deadline_ms, the search keeps improving the best schedule found (not limited to
+        MAX_OPTIMIZATION_ATTEMPTS) until it is fully optimized or the budget runs out, and returns
+        the best schedule found so far with the confidence actually achieved. The initial build
+        attempt always runs to completion.
+
+        With seed_course_data_ids, every previous section that is still a valid option, fulfills a
+        manifest requirement not covered by required_courses and doesn't conflict with them is
+        kept as is, only the other (affected) requirements are searched. The result's confidence
+        is at most the seed_confidence. If no schedule can be built around the kept sections, the
+        search falls back to a cold start.
+
     Returns:
         List of Course objects of the optimized schedule, None if no schedule was time valid.
         Confidence float value.
         Possible combinations count int value.
     """
+    deadline = None if deadline_ms is None else monotonic() + deadline_ms / 1000
     # ---------- Start of initial data checks ----------
     if required_courses is None:  # No required Courses specified.
         required_courses = []
@@ -187,59 +281,124 @@ def course_level_optimizer(
 
     if not options:  # Empty options list.
         return initial_schedule, 1.0, 1
-    if ensure_open_seats:
-        # Remove all options with no open seats.
-        options = [c for c in options if c.available_enrollment > 0]
-        if not options:  # Empty options list.
-            raise API_404_OPEN_SEATS_CONFLICT
-    if ensure_restrictions_met and restrictions_met is not None:
-        # ensure_restrictions_met is True, and restrictions_met is set.
-        # Remove all options that have unmet restrictions.
-        options = [
-            c
-            for c in options
-            if __all_restrictions_met(restrictions_met=restrictions_met, course=c)
-        ]
-        if not options:  # Empty options list.
-            raise API_404_RESTRICTION_CONFLICT
+    options = __filter_options(
+        options=options,
+        ensure_open_seats=ensure_open_seats,
+        ensure_restrictions_met=ensure_restrictions_met,
+        restrictions_met=restrictions_met,
+    )
     # ---------- End of initial data checks ----------
 
     # ---------- Start of schedule manifest generation ----------
-    manifest = []
-    for course in options:
-        if (
-            course.get_comp_key() not in fulfilled_manifest
-            and course.get_comp_key() not in manifest
-        ):
-            manifest.append(course.get_comp_key())
+    manifest = __generate_manifest(options=options, fulfilled_manifest=fulfilled_manifest)
     del fulfilled_manifest  # Delete fulfilled_manifest to prevent mistaken references.
     # ---------- End of schedule manifest generation ----------
 
+    # ---------- Start of warm start ----------
+    seed = __seed_courses(
+        options=options,
+        seed_course_data_ids=seed_course_data_ids or [],
+        initial_schedule=initial_schedule,
+        manifest=manifest,
+    )
+    if seed:
+        seeded_keys = {c.get_comp_key() for c in seed}
+        affected_options = [c for c in options if c.get_comp_key() not in seeded_keys]
+        if not affected_options:  # Nothing is affected, the previous schedule still stands.
+            return __format_result(
+                schedule_result=initial_schedule + seed,
+                confidence=seed_confidence,
+                possible_combos=1,
+            )
+        remaining_ms = None if deadline is None else max(1, int((deadline - monotonic()) * 1000))
+        try:
+            result = course_level_optimizer(
+                options=affected_options,
+                criteria=criteria,
+                required_courses=initial_schedule + seed,
+                solver=solver,
+                deadline_ms=remaining_ms,
+                on_progress=on_progress,
+            )  # Options are already filtered.
+        except HTTPException as h:
+            if h is not API_404_IMPOSSIBLE_BUILD:
+                raise h
+        else:
+            result["confidence"] = min(result["confidence"], seed_confidence)
+            return result
+        # The kept sections prevent every schedule, fall back to a cold start.
+    # ---------- End of warm start ----------
+
     # ---------- Start of options 2D generation ----------
-    options_2d = [(course, criteria.course_eval(course)) for course in options]
+    # options_2d is sorted once here, every build attempt then walks it in order.
+    options_2d = __sorted_options_2d(options=options, criteria=criteria)
+    # Conflict data is encoded once per Course, build attempts only AND / OR bitmasks.
+    masks, graph_rows = __conflict_data(courses=list(chain(options, initial_schedule)))
     # ---------- End of options 2D generation ----------
 
+    options_3d = __generate_options_3d(manifest=manifest, options_2d=options_2d)
+    possible_combos = math.prod(len(sub_list) for sub_list in options_3d)
+    # Total number of possible schedule combinations, with no removal.
+    sections, sections_3d, initial_sections = __generate_sections(
+        options_2d=options_2d,
+        options_3d=options_3d,
+        initial_schedule=initial_schedule,
+        masks=masks,
+        graph_rows=graph_rows,
+    )
+    full_lengths = [len(sub_list) for sub_list in options_3d]
+
+    if solver == OptimizerSolver.Exact:
+
+        def report_improvement(rating: float, build: list[Course]):
+            on_progress(
+                __format_result(
+                    schedule_result=build.copy(),
+                    confidence=__bound_confidence(rating, options_3d),
+                    possible_combos=possible_combos,
+                )
+            )
+
+        best_builds, complete = __top_k_builds(
+            sections_3d=sections_3d,
+            initial_sections=initial_sections,
+            k=1,
+            deadline=deadline,
+            on_improve=None if on_progress is None else report_improvement,
+        )
+        if not best_builds and not complete:
+            # Out of time budget before the search found a schedule, fall back to a greedy build.
+            greedy_result = __attempt_build(
+                sections=sections, lengths=full_lengths, initial_sections=initial_sections
+            )
+            if greedy_result is None:
+                raise API_503_OPTIMIZER_TIMEOUT
+            ratings = {id(section.course): section.rating for section in sections}
+            best_builds = [(sum(ratings.get(id(c), 0.0) for c in greedy_result), greedy_result)]
+        if not best_builds:
+            raise API_404_IMPOSSIBLE_BUILD
+        rating, schedule_result = best_builds[0]
+        # A complete exact search covers every option, the result is provably the best total
+        # rating.
+        return __format_result(
+            schedule_result=schedule_result,
+            confidence=1.0 if complete else __bound_confidence(rating, options_3d),
+            possible_combos=possible_combos,
+        )
+
     # ---------- Start of check first initial build with all options ----------
     # We check if a valid schedule can be built with zero options removed. This is a redundant
     # check done first so that unnecessary calculations are not completed trying to build a
     # schedule which is physically impossible.
     # Note: Underscores are used to differentiate from build attempts with option removal.
-    _options_3d = __remove_n_options(manifest=manifest, n=0, options_2d=options_2d, options_3d=None)
-    _options_2d = list(chain.from_iterable(_options_3d))
-    # Recreate options_2d from options_3d by reshaping to 2D.
     _result = __attempt_build(
-        options_2d=options_2d, initial_schedule=initial_schedule, manifest=manifest
+        sections=sections, lengths=full_lengths, initial_sections=initial_sections
     )
 
     if _result is None:
         raise API_404_IMPOSSIBLE_BUILD
     schedule_result = _result  # schedule_result is initialized here.
-    possible_combos = 1  # Total number of possible schedule combinations.
-    if _options_3d is not None:
-        # Calculate maximum possible combinations at the first build attempt with no removal.
-        for sub_list in _options_3d:
-            possible_combos *= len(sub_list)
-    del _options_3d, _options_2d, _result
+    del _result
     # Delete in prep for option removal build attempts.
     # ---------- End of check first initial build with all options ----------
 
@@ -261,30 +420,44 @@ def course_level_optimizer(
         # courses. I don't want to complicate the currently streamlined code for someone who sent a
         # bad request/parameter. - Daniel
     else:
-        removal_count_limit = len(options) - len(manifest)
+        # At least 1, with a single option per requirement the first attempt halts right away.
+        removal_count_limit = max(1, len(options) - len(manifest))
     # These variables are used in the halving algorithm to find the optimization point the quickest.
     proven_min_index = 0
     checking_max_index = removal_count_limit - 1
-    remove_count = 0
-
-    for attempt_index in range(MAX_OPTIMIZATION_ATTEMPTS):
+    achieved_remove_count = 0  # Options removed for the current schedule_result.
+    if on_progress is not None:  # The initial build is the first schedule found.
+        on_progress(
+            __format_result(
+                schedule_result=schedule_result.copy(),
+                confidence=0.0,
+                possible_combos=possible_combos,
+            )
+        )
+
+    for attempt_index in range(MAX_OPTIMIZATION_ATTEMPTS) if deadline is None else count():
+        if deadline is not None and monotonic() >= deadline:
+            break  # Out of time budget, keep the best schedule so far.
         half_index = __half(proven_min_index, checking_max_index)  # Get the half point.
-        remove_count = half_index + 1
 
-        options_3d = __remove_n_options(
-            manifest=manifest, n=remove_count, options_2d=options_2d, options_3d=None
-        )  # Remove n options.
-        options_2d_temp = list(chain.from_iterable(options_3d))  # Reshape options_3d to 2D.
+        lengths = __distributed_lengths(lengths=full_lengths, n=half_index + 1)  # Remove n options.
         result = __attempt_build(
-            options_2d=options_2d_temp,
-            initial_schedule=initial_schedule,
-            manifest=manifest,
+            sections=sections, lengths=lengths, initial_sections=initial_sections
         )  # Attempt a build with the new half point + 1 options removed.
 
         if result is not None:
             schedule_result = result  # Update to the new valid schedule.
             proven_min_index = half_index  # checking_max_index = SAME_AS_BEFORE.
-        else:
+            achieved_remove_count = half_index + 1
+            if on_progress is not None:
+                on_progress(
+                    __format_result(
+                        schedule_result=schedule_result.copy(),
+                        confidence=achieved_remove_count / removal_count_limit,
+                        possible_combos=possible_combos,
+                    )
+                )
+        elif half_index > proven_min_index:
             # proven_min_index = SAME_AS_BEFORE.
             checking_max_index = half_index - 1
         if proven_min_index == checking_max_index:  # Reached full optimization.
@@ -292,7 +465,9 @@ def course_level_optimizer(
     # ---------- End of build attempts with option removal ----------
 
     # ---------- Start of result processing ----------
-    confidence = remove_count / removal_count_limit
+    # Only the removal count actually achieved is known to be valid, the last attempt may have
+    # failed.
+    confidence = achieved_remove_count / removal_count_limit
     # confidence = total number of options removed / removal_count_limit.
     # Confidence is currently calculated as how close maximum we could optimize the schedule. The
     # best optimization case scenario would mean that options_left = length_of_the_manifest (and
@@ -301,11 +476,215 @@ def course_level_optimizer(
 
     if schedule_result is None:
         return None
+    # ---------- End of result processing ----------
+
+    return __format_result(
+        schedule_result=schedule_result, confidence=confidence, possible_combos=possible_combos
+    )
+
+
+def course_level_top_k(
+    options: list[Course],
+    criteria: CourseOptimizerCriteria,
+    k: int,
+    required_courses: list[Course] = None,
+    ensure_open_seats: bool = False,
+    ensure_restrictions_met: bool = False,
+    restrictions_met: dict = None,
+    deadline_ms: int | None = None,
+) -> dict:
+    """Course level top-k enumeration, the k best distinct time valid schedules of one search.
 
+    Args:
+        options: Individual Course as options for a schedule in a single list.
+        criteria: CourseOptimizerCriteria describes the options criteria.
+        k: Maximum number of schedules to return.
+        required_courses: Optional condition, list of Courses that must be in the final schedule.
+        ensure_open_seats: Optional condition, if ensure_open_seats is True, schedule will only
+            build if courses have a minimum of 1 seat open, default is False.
+        ensure_restrictions_met: Optional condition, if ensure_restrictions_met is True, schedule
+            will only build if courses have all their restrictions met, default is False.
+        restrictions_met: Optional condition, Dictionary of course restrictions met by the user.
+        deadline_ms: Optional condition, time budget in milliseconds, default is None (no budget).
+            If the budget runs out, the best schedules found so far are returned.
+
+    Returns:
+        Dictionary of the schedules <total rating high to low>, each formatted the same as a
+        course_level_optimizer() result with an added total "rating".
+        Possible combinations count int value.
+    """
+    if k < 1:
+        raise ValueError(f"Expected k >= 1, got k={k}")
+    deadline = None if deadline_ms is None else monotonic() + deadline_ms / 1000
+
+    if required_courses is None:  # No required Courses specified.
+        required_courses = []
+    elif schedule_time_conflicts(course_list=required_courses):
+        # Ensure specified Courses are not time conflicting.
+        raise API_400_REQUIRED_COURSES_CONFLICT(required_courses)
+    initial_schedule = required_courses.copy()
+
+    options = __filter_options(
+        options=options,
+        ensure_open_seats=ensure_open_seats,
+        ensure_restrictions_met=ensure_restrictions_met,
+        restrictions_met=restrictions_met,
+    )
+    manifest = __generate_manifest(
+        options=options, fulfilled_manifest=[c.get_comp_key() for c in required_courses]
+    )
+
+    options_2d = __sorted_options_2d(options=options, criteria=criteria)
+    masks, graph_rows = __conflict_data(courses=list(chain(options, initial_schedule)))
+    options_3d = __generate_options_3d(manifest=manifest, options_2d=options_2d)
+    possible_combos = math.prod(len(sub_list) for sub_list in options_3d)
+    _, sections_3d, initial_sections = __generate_sections(
+        options_2d=options_2d,
+        options_3d=options_3d,
+        initial_schedule=initial_schedule,
+        masks=masks,
+        graph_rows=graph_rows,
+    )
+
+    best_builds, complete = __top_k_builds(
+        sections_3d=sections_3d,
+        initial_sections=initial_sections,
+        k=k,
+        deadline=deadline,
+    )
+    if not best_builds:
+        raise API_503_OPTIMIZER_TIMEOUT if not complete else API_404_IMPOSSIBLE_BUILD
+
+    schedules = []
+    for rating, schedule_result in best_builds:
+        result = __format_result(
+            schedule_result=schedule_result,
+            confidence=1.0 if complete else __bound_confidence(rating, options_3d),
+            possible_combos=possible_combos,
+        )
+        result["rating"] = rating
+        schedules.append(result)
+    return {"schedules": schedules, "possible_combinations": possible_combos}
+
+
+def __filter_options(
+    options: list[Course],
+    ensure_open_seats: bool,
+    ensure_restrictions_met: bool,
+    restrictions_met: dict | None,
+) -> list[Course]:
+    """Remove options not meeting the optional seating and restriction conditions.
+
+    Args:
+        options: Individual Course as options for a schedule in a single list.
+        ensure_open_seats: See course_level_optimizer().
+        ensure_restrictions_met: See course_level_optimizer().
+        restrictions_met: See course_level_optimizer().
+
+    Returns:
+        The remaining options.
+
+    Raises:
+        API_404_OPEN_SEATS_CONFLICT: No option has an open seat.
+        API_404_RESTRICTION_CONFLICT: No option has all its restrictions met.
+    """
+    if ensure_open_seats:
+        # Remove all options with no open seats.
+        options = [c for c in options if c.available_enrollment > 0]
+        if not options:  # Empty options list.
+            raise API_404_OPEN_SEATS_CONFLICT
+    if ensure_restrictions_met and restrictions_met is not None:
+        # ensure_restrictions_met is True, and restrictions_met is set.
+        # Remove all options that have unmet restrictions. Course restrictions are compiled once
+        # per section, restrictions_met is compiled once after them (its values are only known
+        # once interned by a Course).
+        compiled = [(c, compile_course_restrictions(course=c)) for c in options]
+        compiled_met = compile_restrictions_met(restrictions_met=restrictions_met)
+        options = [
+            c for c, c_compiled in compiled if restrictions_satisfied(c_compiled, compiled_met)
+        ]
+        if not options:  # Empty options list.
+            raise API_404_RESTRICTION_CONFLICT
+    return options
+
+
+def __seed_courses(
+    options: list[Course],
+    seed_course_data_ids: list[int],
+    initial_schedule: list[Course],
+    manifest: dict[str, int],
+) -> list[Course]:
+    """Get the sections of a previous schedule result kept by a warm start.
+
+    Args:
+        options: Filtered options.
+        seed_course_data_ids: See course_level_optimizer().
+        initial_schedule: See this module's docstring.
+        manifest: See this module's docstring.
+
+    Returns:
+        The kept Courses, at most one per manifest requirement and time valid with
+        initial_schedule.
+    """
+    if not seed_course_data_ids:
+        return []
+    options_by_id = {c.course_data_id: c for c in options}
+    open_keys = set(manifest)
+    schedule = initial_schedule.copy()
+    schedule_masks = [__section_mask(c) for c in schedule]
+    schedule_mask = 0
+    for mask in schedule_masks:
+        schedule_mask |= mask
+
+    seed = []
+    for course_data_id in seed_course_data_ids:
+        course = options_by_id.get(course_data_id)
+        if course is None or course.get_comp_key() not in open_keys:
+            continue  # No longer an option, or its requirement is gone or already fulfilled.
+        mask = __section_mask(course)
+        if conflicts_with_schedule(course, mask, schedule, schedule_masks, schedule_mask):
+            continue
+        seed.append(course)
+        open_keys.discard(course.get_comp_key())
+        schedule.append(course)
+        schedule_masks.append(mask)
+        schedule_mask |= mask
+    return seed
+
+
+def __generate_manifest(options: list[Course], fulfilled_manifest: list[str]) -> dict[str, int]:
+    """Generate the schedule manifest.
+
+    Args:
+        options: Individual Course as options for a schedule in a single list.
+        fulfilled_manifest: Manifest values already fulfilled (by required courses).
+
+    Returns:
+        See this module's docstring.
+    """
+    fulfilled = set(fulfilled_manifest)
+    manifest = {}
+    for course in options:
+        comp_key = course.get_comp_key()
+        if comp_key not in fulfilled and comp_key not in manifest:
+            manifest[comp_key] = len(manifest)
+    return manifest
+
+
+def __format_result(schedule_result: list[Course], confidence: float, possible_combos: int) -> dict:
+    """Format a resulting schedule for the optimizer's return.
+
+    Args:
+        schedule_result: See this module's docstring.
+        confidence: Confidence float value.
+        possible_combos: Possible combinations count int value.
+
+    Returns:
+        Dictionary of the optimizer's result.
+    """
     # Sort the result by a string, this is done mainly for QOL. The return will all have the same
     # order and the data is easier for users to understand.
     schedule_result.sort(key=lambda c: f"{c.course_code} {c.class_type}")
-    # ---------- End of result processing ----------
 
     return {
         "schedule": course_to_extended_meetings(schedule_result),
@@ -317,209 +696,561 @@ def course_level_optimizer(
 
 
 def __attempt_build(
-    options_2d: list[tuple[Course, float]],
-    initial_schedule: list[Course],
-    manifest: list[str],
+    sections: list[OptimizerSection],
+    lengths: list[int],
+    initial_sections: list[OptimizerSection],
 ) -> list[Course] | None:
     """Attempt to build a schedule around an initial_course pick.
 
     Args:
-        options_2d: See this module's docstring.
-        initial_schedule: See this module's docstring.
-        manifest: See this module's docstring.
+        sections: See __generate_sections(), in options_2d order.
+        lengths: Number of options kept per options_3d sublist, see __distributed_lengths().
+        initial_sections: See __generate_sections().
 
     Returns:
         A valid schedule (list[Course]) or None in the case a schedule was not
         possible given the initial_course.
     """
     # Copy initial lists.
-    schedule = initial_schedule.copy()
-    remaining_manifest = manifest.copy()
-    # Sort options_2d (sorting explanation on this module's docstring).
-    options_2d.sort(
-        key=lambda sub_tuple: (
-            __end_time_calculation(course=sub_tuple[0]),
-            __first_meeting_length(course_obj=sub_tuple[0]),
-            sub_tuple[1],
-        ),
-        reverse=True,
+    schedule = [section.course for section in initial_sections]
+    # The running schedule is tracked as a bitmask, initial_schedule is already time valid.
+    schedule_masks = [section.mask for section in initial_sections]
+    schedule_mask = 0
+    for mask in schedule_masks:
+        schedule_mask |= mask
+    remaining_count = len(lengths)  # One manifest requirement per options_3d sublist.
+    if not remaining_count:
+        return schedule
+    fulfilled = [False] * remaining_count
+
+    # Build a schedule.
+    for section in sections:  # Loop through all options.
+        slot = section.slot
+        if fulfilled[slot]:
+            continue
+        if section.rank >= lengths[slot]:
+            continue  # Option was removed.
+        # The section's manifest requirement is still needed, check for schedule time validation.
+        # A single AND against the running schedule mask rules out most conflicts before the
+        # exact check is needed.
+        if __has_conflict(section, schedule, schedule_masks, schedule_mask):
+            continue
+        schedule.append(section.course)
+        schedule_masks.append(section.mask)
+        schedule_mask |= section.mask
+        fulfilled[slot] = True
+        remaining_count -= 1
+        if not remaining_count:  # Schedule is time valid by construction.
+            return schedule
+    return None  # A time valid schedule is not possible.
+
+
+def __top_k_builds(
+    sections_3d: list[list[OptimizerSection]],
+    initial_sections: list[OptimizerSection],
+    k: int,
+    deadline: float | None = None,
+    on_improve: Callable[[float, list[Course]], None] | None = None,
+) -> tuple[list[tuple[float, list[Course]]], bool]:
+    """Build the k schedules with the best total rating using a depth-first branch-and-bound search.
+
+    Notes:
+        The search forward checks every pick: the options of every remaining manifest requirement
+        conflicting with the pick are dropped (a single AND of option bitmasks), and a pick leaving
+        a requirement without options is pruned right away. The requirement with the fewest options
+        left is searched next.
+
+    Args:
+        sections_3d: See __generate_sections(). Each sublist must be sorted by rating
+            <high to low>.
+        initial_sections: See __generate_sections().
+        k: Maximum number of schedules to keep.
+        deadline: time.monotonic() value to stop searching at, None to always search to the end.
+        on_improve: Optional callback, called with (total rating, schedule) of every schedule found
+            with a better total rating than all schedules found before it.
+
+    Returns:
+        Up to k tuples of (total rating, time valid schedule) <total rating high to low>, empty if
+        no time valid schedule was found.
+        True if the search completed, False if it was stopped by the deadline.
+    """
+    schedule = [section.course for section in initial_sections]
+    schedule_masks = [section.mask for section in initial_sections]
+    initial_mask = 0
+    for mask in schedule_masks:
+        initial_mask |= mask
+
+    # Options conflicting with the initial schedule can never be picked, drop them up front.
+    slots = []
+    for sub_list in sections_3d:
+        sub_list = [
+            section
+            for section in sub_list
+            if not __has_conflict(section, schedule, schedule_masks, initial_mask)
+        ]
+        if not sub_list:  # A manifest requirement can not be fulfilled.
+            return [], True
+        slots.append(sub_list)
+
+    # Options are numbered slot by slot in rating order <high to low>, a set of options is a bitmask
+    # of option numbers and the lowest set bit of a slot's options is its best rated option.
+    options = [section for sub_list in slots for section in sub_list]
+    slot_options = []
+    start = 0
+    for sub_list in slots:
+        slot_options.append(((1 << len(sub_list)) - 1) << start)
+        start += len(sub_list)
+    compatible = {}  # Option number -> options not conflicting with the option.
+
+    def compatible_with(i: int) -> int:
+        mask = compatible.get(i)
+        if mask is None:
+            picked = options[i]
+            mask = 0
+            for j, option in enumerate(options):
+                if option.row is not None:  # Conflict graph rows are exact.
+                    conflicting = option.row & picked.mask
+                else:
+                    conflicting = option.mask & picked.mask and schedule_time_conflicts(
+                        [picked.course, option.course]
+                    )
+                if not conflicting:
+                    mask |= 1 << j
+            compatible[i] = mask
+        return mask
+
+    def best_rating(mask: int) -> float:
+        return options[(mask & -mask).bit_length() - 1].rating
+
+    # Bounded min heap of (total rating, insertion count, schedule), heap[0] is the worst kept.
+    # The insertion count keeps earlier found schedules ahead on ties and avoids comparing lists.
+    best_builds = []
+    found_count = 0
+    deadline_reached = False
+
+    def search(remaining: list[int], total: float):
+        # Every option in remaining is time valid with the running schedule.
+        nonlocal found_count, deadline_reached
+        if deadline is not None and monotonic() >= deadline:
+            deadline_reached = True
+        if deadline_reached:
+            return  # Out of time budget, unwind keeping the best schedules so far.
+        if not remaining:
+            found_count += 1
+            entry = (total, -found_count, schedule.copy())
+            if on_improve is not None and (not best_builds or total > max(best_builds)[0]):
+                on_improve(total, entry[2])
+            if len(best_builds) < k:
+                heapq.heappush(best_builds, entry)
+            else:
+                heapq.heapreplace(best_builds, entry)
+            return
+        # Most constrained manifest requirement first.
+        slot_index = min(range(len(remaining)), key=lambda i: remaining[i].bit_count())
+        others = remaining[:slot_index] + remaining[slot_index + 1 :]
+        # Best total rating still reachable from the other requirements, ignoring time conflicts.
+        reachable = sum(best_rating(mask) for mask in others)
+        candidates = remaining[slot_index]
+        # Number of picks searched per narrowed options. A pick leaving the same options as k
+        # (higher rated) picks before it can't build a schedule better than theirs.
+        narrowed_counts = {}
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            i = lowest.bit_length() - 1
+            rating = options[i].rating
+            if len(best_builds) == k and total + rating + reachable <= best_builds[0][0]:
+                break  # Options are in rating order, no later option can do better.
+            mask = compatible_with(i)
+            narrowed = [other & mask for other in others]
+            if not all(narrowed):  # The pick leaves a manifest requirement without options.
+                continue
+            narrowed_key = tuple(narrowed)
+            if narrowed_counts.get(narrowed_key, 0) == k:
+                continue
+            narrowed_counts[narrowed_key] = narrowed_counts.get(narrowed_key, 0) + 1
+            bound = total + rating + sum(best_rating(other) for other in narrowed)
+            if len(best_builds) == k and bound <= best_builds[0][0]:
+                continue  # The narrowed options can't do better, a later option still might.
+            schedule.append(options[i].course)
+            search(narrowed, total + rating)
+            schedule.pop()
+
+    search(remaining=slot_options, total=0.0)
+    builds = [(total, build) for total, _, build in sorted(best_builds, reverse=True)]
+    return builds, not deadline_reached
+
+
+def __bound_confidence(rating: float, options_3d: list[list[tuple[Course, float]]]) -> float:
+    """Confidence of a schedule found by an incomplete search.
+
+    Args:
+        rating: Total rating of the schedule.
+        options_3d: See this module's docstring.
+
+    Returns:
+        rating / the best total rating possible ignoring time conflicts, 1.0 if that bound is 0.
+    """
+    bound = sum(sub_list[0][1] for sub_list in options_3d if sub_list)
+    return min(1.0, max(0.0, rating / bound)) if bound > 0 else 1.0
+
+
+def __conflict_data(courses: list[Course]) -> tuple[dict[int, int], dict[int, int] | None]:
+    """Encode the conflict data of every Course once per request.
+
+    Args:
+        courses: Every option and initial_schedule Course.
+
+    Returns:
+        Tuple of (masks, graph_rows), both keyed by id(Course). If the configured conflict graph
+        covers every Course, masks are the Courses' section bits (1 << section index) and
+        graph_rows their conflict graph rows. Otherwise masks are the Courses' weekly timetable
+        bitmasks and graph_rows is None.
+    """
+    graph = get_conflict_graph()
+    if graph is not None:
+        indexes = {id(c): graph.index_of(c.course_data_id) for c in courses}
+        if None not in indexes.values():
+            return (
+                {key: 1 << index for key, index in indexes.items()},
+                {key: graph.row(index) for key, index in indexes.items()},
+            )
+    return {id(c): __section_mask(c) for c in courses}, None
+
+
+def __section_mask(course: Course) -> int:
+    """Get a section's weekly timetable mask, cached by its meeting times.
+
+    Args:
+        course: Course object to get the mask of.
+
+    Returns:
+        See timetable_bitset.course_mask().
+    """
+    cache_key = __meetings_key(course)
+    with __CACHE_LOCK:
+        mask = __MASK_CACHE.get(cache_key)
+        if mask is not None:
+            __MASK_CACHE.move_to_end(cache_key)
+            return mask
+    mask = course_mask(course)
+    with __CACHE_LOCK:
+        __lru_put(__MASK_CACHE, cache_key, mask, MASK_CACHE_SIZE)
+    return mask
+
+
+def __meetings_key(course: Course) -> tuple:
+    """Hashable key of every meeting field timetable_bitset.course_mask() reads.
+
+    Args:
+        course: Course object to get the key of.
+
+    Returns:
+        Tuple of (time_start, time_end, days_of_week) per meeting.
+    """
+    key = []
+    for meeting in course.class_time or []:
+        days_of_week = getattr(meeting, "days_of_week", None)
+        key.append(
+            (
+                getattr(meeting, "time_start", None),
+                getattr(meeting, "time_end", None),
+                tuple(days_of_week) if isinstance(days_of_week, list) else days_of_week,
+            )
+        )
+    return tuple(key)
+
+
+def __has_conflict(
+    section: OptimizerSection,
+    schedule: list[Course],
+    schedule_masks: list[int],
+    schedule_mask: int,
+) -> bool:
+    """Check if a section conflicts with an already time valid schedule.
+
+    Args:
+        section: OptimizerSection to check.
+        schedule: Time valid list of Courses.
+        schedule_masks: Mask of each Course in schedule (same order as schedule).
+        schedule_mask: OR of all schedule_masks.
+
+    Returns:
+        True if the section conflicts with at least one Course in schedule, False otherwise.
+    """
+    if section.row is not None:  # Conflict graph rows are exact, a single AND is enough.
+        return bool(section.row & schedule_mask)
+    return conflicts_with_schedule(
+        section.course, section.mask, schedule, schedule_masks, schedule_mask
     )
+
+
+def __sorted_options_2d(
+    options: list[Course], criteria: CourseOptimizerCriteria
+) -> list[tuple[Course, float]]:
+    """Rate and sort options into options_2d.
+
+    Args:
+        options: Individual Course as options for a schedule in a single list.
+        criteria: CourseOptimizerCriteria describes the options criteria.
+
+    Returns:
+        options_2d, sorted (sorting explanation on this module's docstring).
+    """
+    criteria_hash = hashlib.sha1(criteria.json(sort_keys=True).encode()).hexdigest()
+    keyed = [(__sort_key(course, criteria, criteria_hash), course) for course in options]
+    keyed.sort(key=lambda key_course: key_course[0], reverse=True)
     # 1. End time calculation <low/early to high/later>.
     # 2. Length of time the first meeting runs <low/early to high/later>.
     # 3. Rating <high to low>.
+    return [(course, key[2]) for key, course in keyed]
 
-    # Build a schedule.
-    for course, _ in options_2d:  # Loop through all options.
-        if course.get_comp_key() in remaining_manifest and not schedule_time_conflicts(
-            schedule + [course]
-        ):
-            # Check if the Course's manifest representative value is still listed (as needed) on
-            # the manifest and check for schedule time validation.
-            schedule.append(course)
-            remaining_manifest.remove(course.get_comp_key())
-        if len(remaining_manifest) == 0 and not schedule_time_conflicts(schedule):
-            return schedule
-    return None  # A time valid schedule is not possible.
 
+def __sort_key(
+    course: Course, criteria: CourseOptimizerCriteria, criteria_hash: str
+) -> tuple[int, int, float]:
+    """Get a section's sort key record.
 
-def __end_time_calculation(course: Course) -> timedelta:
-    """Get a course's first meeting time end to a time delta for easy sort key value calculation.
+    The time keys are a few integer operations on the first meeting and don't depend on the
+    criteria, only the rating is cached.
 
     Args:
-        course: Course object to get end time timedelta of.
+        course: Course object to get the sort key record of.
+        criteria: CourseOptimizerCriteria describes the options criteria.
+        criteria_hash: Hash of the serialized criteria.
 
     Returns:
-        The difference between the first meeting start and end times as datetime.timedelta(),
-        timedelta(0) if meetings do not exist.
+        Tuple of (end time key, first meeting length key, rating).
     """
-    if course.class_time is None or not course.class_time:  # None or empty class time.
-        return timedelta(0)
-    return datetime.combine(date.min, time.max) - datetime.combine(
-        date.min, course.class_time[0].time_end
+    return (
+        __end_time_key(course=course),
+        __first_meeting_length_key(course_obj=course),
+        __rating(course, criteria, criteria_hash),
     )
 
 
-def __first_meeting_length(course_obj: Course) -> timedelta:
+def __rating(course: Course, criteria: CourseOptimizerCriteria, criteria_hash: str) -> float:
+    """Get a section's rating, cached by section content and criteria hash.
+
+    Args:
+        course: Course object to rate.
+        criteria: CourseOptimizerCriteria describes the options criteria.
+        criteria_hash: Hash of the serialized criteria.
+
+    Returns:
+        criteria.course_eval(course).
+    """
+    cache_key = (__content_digest(course), criteria_hash)
+    with __CACHE_LOCK:
+        rating = __RATING_CACHE.get(cache_key)
+        if rating is not None:
+            __RATING_CACHE.move_to_end(cache_key)
+            return rating
+
+    rating = criteria.course_eval(course)
+    with __CACHE_LOCK:
+        __lru_put(__RATING_CACHE, cache_key, rating, RATING_CACHE_SIZE)
+    return rating
+
+
+def __content_digest(course: Course) -> bytes:
+    """Digest of a section's whole content, any edit (timetable, seats, ...) changes it.
+
+    Equal digests mean equal content, equal content serialized differently only misses the cache.
+    """
+    return hashlib.blake2b(
+        pickle.dumps(course, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+    ).digest()
+
+
+def __lru_put(cache: OrderedDict, key, value, max_size: int):
+    """Put a value in an LRU cache, evicting the least recently used entry if full."""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def __microseconds(t: time) -> int:
+    """Microseconds since the start of the day of a time."""
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond
+
+
+def __end_time_key(course: Course) -> int:
+    """Get a course's first meeting time end as an int for easy sort key value calculation.
+
+    Args:
+        course: Course object to get end time key of.
+
+    Returns:
+        The difference between the end of the day (time.max) and the first meeting end time in
+        microseconds, 0 if meetings do not exist.
+    """
+    if course.class_time is None or not course.class_time:  # None or empty class time.
+        return 0
+    return __microseconds(time.max) - __microseconds(course.class_time[0].time_end)
+
+
+def __first_meeting_length_key(course_obj: Course) -> int:
     """Length of time a course's first meeting runs for.
 
     Args:
-        course_obj:
+        course_obj: Course object to get the first meeting length of.
 
     Returns:
-        The difference between the first meeting start and end times as datetime.timedelta(),
-        timedelta(0) if meetings do not exist.
+        The difference between the first meeting start and end times in microseconds, 0 if
+        meetings do not exist.
     """
     if course_obj.class_time is None or not course_obj.class_time:
         # None or empty class time.
-        return timedelta(0)
+        return 0
     return abs(
-        datetime.combine(date.min, course_obj.class_time[0].time_end)
-        - datetime.combine(date.min, course_obj.class_time[0].time_start)
+        __microseconds(course_obj.class_time[0].time_end)
+        - __microseconds(course_obj.class_time[0].time_start)
     )
 
 
-def __remove_n_options(
-    manifest: list[str],
-    n: int,
-    options_2d: list[tuple[Course, float]] = None,
-    options_3d: list[list[tuple[Course, float]]] = None,
+def __generate_options_3d(
+    manifest: dict[str, int], options_2d: list[tuple[Course, float]]
 ) -> list[list[tuple[Course, float]]]:
-    """Remove "n" the lowest rated courses distributed by manifest requirements.
+    """Generate options_3d from options_2d.
 
     Args:
+        manifest: See this module's docstring.
         options_2d: See this module's docstring.
-        options_3d: See this module's docstring.
-        n: n (int) number of courses to remove by lowest ratings.
 
     Returns:
-        options_3d with lowest "n" ratings removed distributively.
-
-    Raises:
-        ValueError: At least one of options_2d and options_3d must be specified.
+        See this module's docstring.
     """
-    if n < 0:
-        raise ValueError(f"Expected n > 0, got n={n}")
-    if options_2d is None and options_3d is None:
-        raise ValueError("At least one of options_2d and options_3d must be specified.")
-
-    if options_2d is not None and options_3d is None:
-        # Options_2d is given, but not options_3d, generate a 3d version.
-        options_3d = [[] for _ in manifest]
-        for course, rating in options_2d:
-            if course.get_comp_key() in manifest:
-                # This if statement ensures that the course is still required. In other words the
-                # current Course object being checked is not already fulfilled by the manifest.
-                # Without this if statement there is a possibility that .index() will ValueError.
-                # This will occur when the Course object being checked matches the
-                # __get_manifest_value() of a Course object which was specified through
-                # required_crn. Basically we skip courses already specified by the required_crns
-                # since we already saved it into the initial schedule.
-                options_3d[manifest.index(course.get_comp_key())].append((course, rating))
-        # Sort options_3d (sorting explanation on this module's docstring).
-        # Sorting is done only on initialization.
-        options_3d.sort(key=lambda option_sub_list: len(option_sub_list))
-        # 1. Options per sublist <low to high>.
-        for sub_list in options_3d:
-            sub_list.sort(key=lambda sub_tuple: (sub_tuple[1]), reverse=True)
-            # 1. Rating <high to low>.
-    # Remove "n" the lowest rated courses distributed by manifest requirements.
-    lengths = __distributed_lengths(options_3d=options_3d, n=n)  # Get lengths.
-    options_3d = [sub_list[: lengths[i]] for (i, sub_list) in enumerate(options_3d)]
-    # Apply new lengths.
+    options_3d = [[] for _ in manifest]
+    for course, rating in options_2d:
+        i = manifest.get(course.get_comp_key())  # Slot id, None if not required.
+        if i is not None:
+            # This if statement ensures that the course is still required. In other words the
+            # current Course object being checked is not already fulfilled by the manifest.
+            # Basically we skip courses already specified by the required courses since we
+            # already saved it into the initial schedule.
+            options_3d[i].append((course, rating))
+    # Sort options_3d (sorting explanation on this module's docstring).
+    # Sorting is done only on initialization.
+    options_3d.sort(key=lambda option_sub_list: len(option_sub_list))
+    # 1. Options per sublist <low to high>.
+    for sub_list in options_3d:
+        sub_list.sort(key=lambda sub_tuple: (sub_tuple[1]), reverse=True)
+        # 1. Rating <high to low>.
     return options_3d
 
 
-def __distributed_lengths(options_3d: list[list[tuple[Course, float]]], n: int) -> list[int]:
-    """Calculate (distributed) lengths of each sublist on options_3d.
+def __generate_sections(
+    options_2d: list[tuple[Course, float]],
+    options_3d: list[list[tuple[Course, float]]],
+    initial_schedule: list[Course],
+    masks: dict[int, int],
+    graph_rows: dict[int, int] | None,
+) -> tuple[list[OptimizerSection], list[list[OptimizerSection]], list[OptimizerSection]]:
+    """Build the OptimizerSection record of every option and initial_schedule Course once.
+
+    Args:
+        options_2d: See this module's docstring, must already be sorted.
+        options_3d: See this module's docstring.
+        initial_schedule: See this module's docstring.
+        masks: See __conflict_data().
+        graph_rows: See __conflict_data().
+
+    Returns:
+        Tuple of (sections, sections_3d, initial_sections). sections are the options_3d options
+        in options_2d order, sections_3d has the same structure as options_3d and
+        initial_sections are the initial_schedule Courses.
+    """
+    sections_3d = []
+    by_course = {}  # id(Course) -> OptimizerSection.
+    for slot, sub_list in enumerate(options_3d):
+        sections_3d.append([])
+        for rank, (course, rating) in enumerate(sub_list):
+            section = OptimizerSection(
+                course=course,
+                slot=slot,
+                rank=rank,
+                rating=rating,
+                mask=masks[id(course)],
+                row=None if graph_rows is None else graph_rows[id(course)],
+            )
+            sections_3d[-1].append(section)
+            by_course[id(course)] = section
+    sections = [by_course[id(c)] for c, _ in options_2d if id(c) in by_course]
+    initial_sections = [
+        OptimizerSection(
+            course=c,
+            slot=-1,
+            rank=0,
+            rating=0.0,
+            mask=masks[id(c)],
+            row=None if graph_rows is None else graph_rows[id(c)],
+        )
+        for c in initial_schedule
+    ]
+    return sections, sections_3d, initial_sections
+
+
+def __distributed_lengths(lengths: list[int], n: int) -> list[int]:
+    """Calculate (distributed) lengths of each sublist on options_3d after removing n options.
 
     Notes:
-        This is the main logic that handels distributive option removal.
+        This is the main logic that handels distributive option removal. The longest sublists are
+        shortened first ("water-filling") down to a common level, sublists never go below a length
+        of 1. Remaining removals that don't fill a whole level are taken from the first sublists
+        at that level. The level is found in closed form in a single pass from the longest
+        sublist, O(len(lengths)) for any n.
 
     Args:
-        options_3d: See this module's docstring.
+        lengths: Length of each sublist on options_3d, sorted <low to high> like options_3d.
         n: n (int) number of options (courses) to remove (by lowest ratings).
 
     Returns:
         List of lengths of each sublist on options_3d after removing n elements.
 
-    Examples: (These examples are of incorrect param type, but work as examples)
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=0)
+    Examples:
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=0)
         [1, 3, 3, 5]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=1)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=1)
         [1, 3, 3, 4]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=2)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=2)
         [1, 3, 3, 3]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=3)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=3)
         [1, 2, 3, 3]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=4)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=4)
         [1, 2, 2, 3]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=5)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=5)
         [1, 2, 2, 2]
-        >>> __distributed_lengths(options_3d=[[1], [3, 3, 3], [3, 3, 3], [5, 5, 5, 5, 5]], n=99999)
+        >>> __distributed_lengths(lengths=[1, 3, 3, 5], n=99999)
         [1, 1, 1, 1]
     """
     if n < 0:
         raise ValueError(f"Expected n > 0, got n={n}")
 
-    lengths = [len(sub_list) for sub_list in options_3d]
-    remove_count_sum = 0
-    reached_end = True
-    while reached_end:
-        for _ in range(len(options_3d)):
-            if remove_count_sum == n or (len(set(lengths)) == 1 == lengths[0]):
-                # Remove count cap reached or all elements in lengths have reached the minimum
-                # value of 1.
-                reached_end = False  # Declare to end while loop.
-                break  # End for loop.
-            # TODO(Daniel): TEMPORARY REDUNDANCY CODE vvv
-            if remove_count_sum >= n:
-                raise RuntimeError("FATAL OPTIMIZER ERROR: remove_count_sum >= n")
-            # TODO(Daniel): TEMPORARY REDUNDANCY CODE ^^^
-            count = 0
-            max_length = lengths[-1]
-            i_remove = lengths.index(max_length)
-            # Index to remove options (reduce lengths).
-            if lengths[i_remove] > 1:
-                # All elements in lengths must have the minimum value of 1.
-                if i_remove > 0:  # Backwards length value check is required.
-                    if i_remove < len(lengths) - 1 and lengths[i_remove] == lengths[i_remove + 1]:
-                        # Forwards length value check is required and passed.
-                        count = 1  # Forwards length value is tied, remove 1.
-                    else:
-                        count = lengths[i_remove] - lengths[i_remove - 1]
-                        # Calculate remove value as difference between current length value and 1
-                        # index backwards.
-                else:
-                    count = 1  # No backwards length value check, auto remove 1.
-            # Remove count cap reached checks.
-            if count > n:
-                count = n
-            elif remove_count_sum + count > n:
-                count = (remove_count_sum + count) - n
-            # Update with new counts value.
-            lengths[i_remove] -= count
-            remove_count_sum += count
-    return lengths
+    level = 1  # Every sublist is cut down to at most level options.
+    suffix_sum = 0
+    for i in range(len(lengths) - 1, -1, -1):
+        # Try cutting lengths[i:] down to a common level between lengths[i - 1] and lengths[i].
+        suffix_sum += lengths[i]
+        count = len(lengths) - i
+        lower_limit = max(lengths[i - 1], 1) if i > 0 else 1
+        candidate = -(-(suffix_sum - n) // count)  # Lowest level removing at most n options.
+        if candidate >= lower_limit:
+            level = candidate
+            break
+
+    result = [min(length, level) for length in lengths]
+    remaining = n - (sum(lengths) - sum(result))
+    if level > 1:
+        # Take the remaining removals from the first sublists at the level.
+        for i, length in enumerate(result):
+            if remaining <= 0:
+                break
+            if length == level:
+                result[i] -= 1
+                remaining -= 1
+    return result
 
 
 def __half(min_limit: int, max_limit: int) -> int:
@@ -558,42 +1289,3 @@ def __half(min_limit: int, max_limit: int) -> int:
     """
     assert min_limit <= max_limit, "Expected min_limit <= max_limit"
     return math.ceil(min_limit + ((max_limit - min_limit) / 2))
-
-
-def __all_restrictions_met(restrictions_met: dict, course: Course) -> bool:
-    """Check if a restrictions given meet the restrictions of a Course.
-
-    Args:
-        restrictions_met: Restrictions currently met.
-        course: Course object to check restrictions of.
-
-    Returns:
-        True of all restrictions are met, False if not met.
-    """
-    if not isinstance(restrictions_met, dict):
-        raise TypeError(f"restrictions_met expected {dict}, received {type(restrictions_met)}")
-
-    for r_type, r_list in course.restrictions.items():
-        # We are checking for 1) the type of restriction and 2) the count of restriction
-        # condition(s) (singular vs all) needed to be met.
-        if r_type in restrictions_met.keys():  # Check for matching type.
-            if SINGULAR_CONDITION.lower() in r_type.lower():
-                # Ensure a singular condition.
-                passed_singular_check = False
-                for r_value_detail in r_list:
-                    # Check that the course's current r_list being checked has a match with at
-                    # least one of the user's specified met restrictions for that specific type of
-                    # restriction.
-                    if r_value_detail in restrictions_met[r_type]:
-                        passed_singular_check = True
-                        break
-                if not passed_singular_check:
-                    return False
-            elif not set(r_list).issubset(set(restrictions_met[r_type])):
-                # Ensure all conditions. Check that the course's current r_list being checked is a
-                # subset of the user's specified met restrictions for that specific type of
-                # restriction.
-                return False
-        else:  # Matching type not found.
-            return False
-    return True
@@ -0,0 +1,90 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Single-flight request coalescing module.
+
+Concurrent callers of the same canonical key share a single in-flight unit of work: the first
+caller (leader) starts it, every caller arriving before it finishes (follower) awaits the same
+result or exception. Nothing is cached, the next call after it finished starts a new unit of work.
+
+Notes:
+    The unit of work runs as its own task, a cancelled caller (for example a disconnected client)
+    doesn't cancel it for the other callers.
+
+    Results are shared by every caller and must not be mutated.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """In-process single-flight group of one event loop.
+
+    Attributes:
+        retry_if: Optional predicate of a leader's exception followers don't share but retry on
+            (as the next leader), for example errors specific to the leader's request.
+    """
+
+    def __init__(self, retry_if: Callable[[BaseException], bool] | None = None):
+        self.retry_if = retry_if
+        self.__in_flight: dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Run fn, or join the in-flight run of the same key.
+
+        Args:
+            key: Canonical key, equal keys must have equal results.
+            fn: Callable returning the awaitable unit of work.
+
+        Returns:
+            The result of the (shared) unit of work.
+        """
+        while True:
+            task = self.__in_flight.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(fn())
+                self.__in_flight[key] = task
+                task.add_done_callback(lambda done, key=key: self.__done(key, done))
+                self.leaders += 1
+            else:
+                self.followers += 1
+            try:
+                return await asyncio.shield(task)
+            except Exception as e:
+                if leader or self.retry_if is None or not self.retry_if(e):
+                    raise e
+
+    def stats(self) -> dict:
+        """Get the single-flight statistics.
+
+        Returns:
+            Dictionary of the number of units in flight, leaders and followers.
+        """
+        return {
+            "in_flight": len(self.__in_flight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+    def __done(self, key: Hashable, task: asyncio.Future):
+        """Forget a finished unit of work."""
+        if self.__in_flight.get(key) is task:
+            del self.__in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, an exception nobody awaited isn't logged as lost.
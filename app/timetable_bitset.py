@@ -0,0 +1,138 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Bitset encoded weekly timetable module.
+
+A week is divided into 7 days of SLOTS_PER_DAY slots, each slot is SLOT_MINUTES long. A meeting (or
+a whole Course) is encoded as a python int where bit (day * SLOTS_PER_DAY + slot) is set if the
+meeting occupies that slot. Two schedules can then be checked for overlap with a single AND, and
+merged with a single OR.
+
+Notes:
+    Weekly masks are a conservative over-approximation of a meeting: times are rounded outwards to
+    the nearest slot and date ranges / occurrence intervals are ignored. If two masks are disjoint
+    the meetings can never conflict, if they overlap the meetings MIGHT conflict and the exact
+    py_core schedule_time_conflicts() check has to confirm it. Any meeting whose days or times can
+    not be read is encoded as occupying every slot of its day(s), which forces the exact check.
+"""
+
+from datetime import time
+
+from py_core.classes.course_class import Course, schedule_time_conflicts
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = (24 * 60) // SLOT_MINUTES
+DAYS_PER_WEEK = 7
+
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+FULL_WEEK_MASK = (1 << (SLOTS_PER_DAY * DAYS_PER_WEEK)) - 1
+
+
+def meeting_mask(meeting) -> int:
+    """Encode a single meeting into a weekly bitmask.
+
+    Args:
+        meeting: py_core Meeting (or ExtendedMeeting) object.
+
+    Returns:
+        Weekly bitmask of the slots occupied by the meeting.
+    """
+    day_mask = __day_slots_mask(
+        time_start=getattr(meeting, "time_start", None),
+        time_end=getattr(meeting, "time_end", None),
+    )
+    mask = 0
+    for day in __weekdays(getattr(meeting, "days_of_week", None)):
+        mask |= day_mask << (day * SLOTS_PER_DAY)
+    return mask
+
+
+def course_mask(course: Course) -> int:
+    """Encode all of a Course's meetings into a single weekly bitmask.
+
+    Args:
+        course: Course object to encode.
+
+    Returns:
+        Weekly bitmask of the slots occupied by the course, 0 if the course has no meetings.
+    """
+    mask = 0
+    for meeting in course.class_time or []:
+        mask |= meeting_mask(meeting)
+    return mask
+
+
+def conflicts_with_schedule(
+    course: Course,
+    mask: int,
+    schedule: list[Course],
+    schedule_masks: list[int],
+    schedule_mask: int,
+) -> bool:
+    """Check if a course conflicts with an already time valid schedule.
+
+    Args:
+        course: Course object to check.
+        mask: course_mask() of course.
+        schedule: Time valid list of Courses.
+        schedule_masks: course_mask() of each Course in schedule (same order as schedule).
+        schedule_mask: OR of all schedule_masks.
+
+    Returns:
+        True if course conflicts with at least one Course in schedule, False otherwise.
+    """
+    if not mask & schedule_mask:  # Fast path, no shared slot means no conflict possible.
+        return False
+    # Only the Courses sharing at least one slot need the exact check. The schedule is already
+    # time valid so pairs within the schedule never have to be re-checked.
+    overlapping = [c for c, m in zip(schedule, schedule_masks) if m & mask]
+    return schedule_time_conflicts(overlapping + [course])
+
+
+def __day_slots_mask(time_start: time | None, time_end: time | None) -> int:
+    """Slots occupied within a single day, rounded outwards to whole slots.
+
+    Args:
+        time_start: Meeting start time.
+        time_end: Meeting end time.
+
+    Returns:
+        Bitmask of SLOTS_PER_DAY bits, FULL_DAY_MASK if the times can't be read.
+    """
+    if not isinstance(time_start, time) or not isinstance(time_end, time):
+        return FULL_DAY_MASK
+    start = (time_start.hour * 60 + time_start.minute) // SLOT_MINUTES
+    end_minutes = time_end.hour * 60 + time_end.minute + (1 if time_end.second else 0)
+    end = -(-end_minutes // SLOT_MINUTES)  # Ceiling division.
+    if end <= start:  # Zero length or overnight meeting, be conservative.
+        return FULL_DAY_MASK
+    return ((1 << (end - start)) - 1) << start
+
+
+def __weekdays(days_of_week) -> list[int]:
+    """Weekday indexes (0 = Monday) a meeting runs on.
+
+    Args:
+        days_of_week: Sequence of 7 truthy values or a string of 7 "0"/"1" characters, Monday
+            first.
+
+    Returns:
+        List of weekday indexes, all 7 days if days_of_week can't be read.
+    """
+    if days_of_week is None or len(days_of_week) != DAYS_PER_WEEK:
+        return list(range(DAYS_PER_WEEK))
+    if isinstance(days_of_week, str):
+        return [i for i, d in enumerate(days_of_week) if d not in ("0", " ", "-")]
+    return [i for i, d in enumerate(days_of_week) if d]
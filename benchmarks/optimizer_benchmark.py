@@ -0,0 +1,325 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Schedule optimizer benchmark suite.
+
+Builds synthetic Course catalogs and times the optimizer as a whole (macro, both the greedy and the
+exact solver) and its build steps separately (micro), then writes a machine-readable JSON report.
+Every combination of the given catalog parameters is one benchmark case.
+
+Usage (from the repository root):
+    python -m benchmarks.optimizer_benchmark --courses 4 8 12 --output optimizer_benchmark.json
+
+Notes:
+    The app package is imported the same way main.py runs it, with the app directory on sys.path.
+    No request is served, AUTH_SECRET_KEY defaults to a placeholder if not set.
+
+    Every run uses fresh course_data_ids so cross-request caches (ratings, sort keys, compiled
+    restrictions) never hit, timings are cold per request.
+
+    conflict_density: Approximate probability that two meetings on the same day share a time
+        block. Meetings start on one of round(1 / conflict_density) time blocks.
+
+    rating_spread: Ratings are uniformly distributed within [0, rating_spread], 0 rates every
+        option the same (no option removal).
+
+    exact_deadline_ms: Time budget of every exact solver run. A run stopped by the budget returns
+        its best schedule so far, with a confidence below 1.0.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time as timer
+from datetime import date, datetime, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(1, os.path.join(ROOT, "app"))
+os.environ.setdefault("AUTH_SECRET_KEY", "benchmark")
+
+from fastapi import HTTPException
+
+from py_core.classes.course_class import Course
+from py_core.classes.optimizer_criteria_class import CourseOptimizerCriteria
+
+from app import schedule_optimizer
+
+CLASS_TYPES = ("LEC", "LAB", "TUT")
+TERM_START = date(2023, 9, 5)
+TERM_END = date(2023, 12, 5)
+DAY_START_MINUTES = 8 * 60
+DAY_END_MINUTES = 21 * 60
+WEEKDAYS = 5
+
+# Module-private optimizer steps timed separately.
+__OPTIMIZER = vars(schedule_optimizer)
+__sorted_options_2d = __OPTIMIZER["__sorted_options_2d"]
+__conflict_data = __OPTIMIZER["__conflict_data"]
+__generate_manifest = __OPTIMIZER["__generate_manifest"]
+__generate_options_3d = __OPTIMIZER["__generate_options_3d"]
+__generate_sections = __OPTIMIZER["__generate_sections"]
+__attempt_build = __OPTIMIZER["__attempt_build"]
+__distributed_lengths = __OPTIMIZER["__distributed_lengths"]
+
+__next_course_data_id = 1
+
+
+class SyntheticCriteria(CourseOptimizerCriteria):
+    """Optimizer criteria rating each section by a seeded random value within rating_spread."""
+
+    bench_seed: int = 0
+    rating_spread: float = 1.0
+
+    def course_eval(self, course: Course) -> float:
+        return random.Random(course.course_data_id * 1_000_003 + self.bench_seed).uniform(
+            0, self.rating_spread
+        )
+
+
+def synthetic_catalog(
+    courses: int,
+    sections_per_course: int,
+    meetings_per_section: int,
+    conflict_density: float,
+    seed: int,
+) -> list[Course]:
+    """Build a synthetic catalog of Courses.
+
+    Args:
+        courses: Number of courses (course codes), each has 1 to 3 class types.
+        sections_per_course: Number of sections per course class type.
+        meetings_per_section: Number of weekly meetings per section.
+        conflict_density: See this module's docstring.
+        seed: Random seed.
+
+    Returns:
+        List of Course objects (options).
+    """
+    global __next_course_data_id
+
+    rnd = random.Random(seed)
+    meeting_cls = Course.__fields__["class_time"].type_
+    block_count = max(1, round(1 / conflict_density))
+    block_minutes = (DAY_END_MINUTES - DAY_START_MINUTES) // block_count
+    catalog = []
+    for course_index in range(courses):
+        for class_type in CLASS_TYPES[: rnd.randint(1, len(CLASS_TYPES))]:
+            for _ in range(sections_per_course):
+                course_data_id = __next_course_data_id
+                __next_course_data_id += 1
+                meetings = []
+                for _ in range(meetings_per_section):
+                    start = DAY_START_MINUTES + rnd.randrange(block_count) * block_minutes
+                    end = start + min(block_minutes, rnd.choice((50, 80, 110)))
+                    weekday = rnd.randrange(WEEKDAYS)
+                    meeting = {
+                        "time_start": time(start // 60, start % 60),
+                        "time_end": time(end // 60, end % 60),
+                        "date_start": TERM_START,
+                        "date_end": TERM_END,
+                        "days_of_week": [day == weekday for day in range(7)],
+                    }
+                    meetings.append(
+                        meeting_cls.construct(
+                            **{k: v for k, v in meeting.items() if k in meeting_cls.__fields__}
+                        )
+                    )
+                catalog.append(
+                    Course.construct(
+                        course_data_id=course_data_id,
+                        course_id=course_index,
+                        crn=course_data_id,
+                        course_code=f"BENCH{course_index:04d}U",
+                        class_type=class_type,
+                        available_enrollment=rnd.randint(0, 30),
+                        restrictions={},
+                        class_time=meetings,
+                    )
+                )
+    return catalog
+
+
+def run_case(params: dict, repeat: int, seed: int, exact_deadline_ms: int) -> dict:
+    """Time the optimizer and its build steps on fresh catalogs.
+
+    Args:
+        params: Catalog parameters, see synthetic_catalog() and this module's docstring.
+        repeat: Number of timed runs.
+        seed: Random seed of the first run.
+        exact_deadline_ms: Time budget of the exact solver runs.
+
+    Returns:
+        Dictionary of the case's params and timings (seconds) per timed step.
+    """
+    samples = {}
+    results = {"feasible": 0, "infeasible": 0, "exact_confidence": [], "exact_errors": []}
+
+    def timed(name: str, fn, **kwargs):
+        start = timer.perf_counter()
+        try:
+            return fn(**kwargs)
+        finally:
+            samples.setdefault(name, []).append(timer.perf_counter() - start)
+
+    for run in range(repeat):
+        options = synthetic_catalog(
+            courses=params["courses"],
+            sections_per_course=params["sections_per_course"],
+            meetings_per_section=params["meetings_per_section"],
+            conflict_density=params["conflict_density"],
+            seed=seed + run,
+        )
+        criteria = SyntheticCriteria.construct(
+            bench_seed=seed + run, rating_spread=params["rating_spread"]
+        )
+
+        # Macro, the whole greedy optimizer.
+        try:
+            timed(
+                "course_level_optimizer",
+                schedule_optimizer.course_level_optimizer,
+                options=list(options),
+                criteria=criteria,
+            )
+            results["feasible"] += 1
+        except HTTPException:
+            results["infeasible"] += 1
+
+        # Macro, the whole exact solver within the time budget of an interactive request.
+        try:
+            result = timed(
+                "course_level_optimizer_exact",
+                schedule_optimizer.course_level_optimizer,
+                options=list(options),
+                criteria=criteria,
+                solver=schedule_optimizer.OptimizerSolver.Exact,
+                deadline_ms=exact_deadline_ms,
+            )
+            results["exact_confidence"].append(result["confidence"])
+        except HTTPException as h:
+            results["exact_errors"].append(h.status_code)
+
+        # Micro, every build step on its own (ratings and sort keys are cached by now).
+        options_2d = timed(
+            "__sorted_options_2d", __sorted_options_2d, options=options, criteria=criteria
+        )
+        masks, graph_rows = timed("__conflict_data", __conflict_data, courses=options)
+        manifest = __generate_manifest(options=options, fulfilled_manifest=[])
+        options_3d = timed(
+            "__generate_options_3d", __generate_options_3d, manifest=manifest, options_2d=options_2d
+        )
+        sections, _, initial_sections = timed(
+            "__generate_sections",
+            __generate_sections,
+            options_2d=options_2d,
+            options_3d=options_3d,
+            initial_schedule=[],
+            masks=masks,
+            graph_rows=graph_rows,
+        )
+        full_lengths = [len(sub_list) for sub_list in options_3d]
+        lengths = timed(
+            "__distributed_lengths",
+            __distributed_lengths,
+            lengths=full_lengths,
+            n=(len(options) - len(manifest)) // 2,
+        )
+        timed(
+            "__attempt_build",
+            __attempt_build,
+            sections=sections,
+            lengths=lengths,
+            initial_sections=initial_sections,
+        )
+
+    return {
+        "params": params,
+        "options": len(options),
+        "results": results,
+        "timings": {
+            name: {
+                "runs": len(values),
+                "min_s": min(values),
+                "median_s": statistics.median(values),
+                "mean_s": statistics.fmean(values),
+            }
+            for name, values in samples.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, nargs="+", default=[4, 8, 12, 15])
+    parser.add_argument("--sections-per-course", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--meetings-per-section", type=int, nargs="+", default=[2])
+    parser.add_argument("--conflict-density", type=float, nargs="+", default=[0.05, 0.2])
+    parser.add_argument("--rating-spread", type=float, nargs="+", default=[10.0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exact-deadline-ms", type=int, default=20_000)
+    parser.add_argument("--output", default="optimizer_benchmark.json")
+    args = parser.parse_args()
+
+    cases = []
+    for courses, sections, meetings, density, spread in itertools.product(
+        args.courses,
+        args.sections_per_course,
+        args.meetings_per_section,
+        args.conflict_density,
+        args.rating_spread,
+    ):
+        params = {
+            "courses": courses,
+            "sections_per_course": sections,
+            "meetings_per_section": meetings,
+            "conflict_density": density,
+            "rating_spread": spread,
+        }
+        case = run_case(
+            params=params,
+            repeat=args.repeat,
+            seed=args.seed,
+            exact_deadline_ms=args.exact_deadline_ms,
+        )
+        cases.append(case)
+        print(
+            f"{params} options={case['options']} "
+            f"optimizer median={case['timings'].get('course_level_optimizer', {}).get('median_s')} "
+            f"exact median={case['timings']['course_level_optimizer_exact']['median_s']}"
+        )
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "exact_deadline_ms": args.exact_deadline_ms,
+        "cases": cases,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Async database access tests."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import async_db
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class TBL_Item(Base):
+    __tablename__ = "item"
+
+    item_id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+@pytest.fixture
+def unconfigured(monkeypatch):
+    """async_db state before init_async_database() was called, restored after the test."""
+    monkeypatch.setitem(vars(async_db), "__configured", False)
+    monkeypatch.setitem(vars(async_db), "__engine", None)
+    monkeypatch.setitem(vars(async_db), "__session_maker", None)
+
+
+@pytest.fixture
+def sync_session(monkeypatch, unconfigured):
+    """Threadpool fallback, no async engine and the py_core Session on an in-memory database."""
+    # One shared connection, the threadpool must see the same in-memory database.
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(engine, expire_on_commit=False)
+    with session_maker.begin() as session:
+        session.add_all([TBL_Item(item_id=i, name=f"item {i}") for i in range(1, 4)])
+
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    monkeypatch.setattr(async_db.DG, "Session", session_maker, raising=False)
+    yield
+    engine.dispose()
+
+
+def test_fetch_all_threadpool_fallback(sync_session):
+    """Without an async engine statements run on the py_core Session, converted in session."""
+    items = asyncio.run(
+        async_db.fetch_all(
+            select(TBL_Item).where(TBL_Item.item_id.in_([1, 3])).order_by(TBL_Item.item_id),
+            convert=lambda row: (row.item_id, row.name),
+        )
+    )
+    assert items == [(1, "item 1"), (3, "item 3")]
+    assert vars(async_db)["__session_maker"] is None
+
+    names = asyncio.run(async_db.fetch_all(select(TBL_Item.name).order_by(TBL_Item.item_id)))
+    assert names == ["item 1", "item 2", "item 3"]
+
+
+def test_fetch_all_async_engine(monkeypatch, unconfigured):
+    """With ASYNC_DATABASE_URL statements run on the async engine, converted in session."""
+    monkeypatch.setenv("ASYNC_DATABASE_URL", "sqlite+aiosqlite://")
+
+    async def fetch():
+        assert async_db.init_async_database()
+        async with vars(async_db)["__engine"].begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                insert(TBL_Item), [{"item_id": i, "name": f"item {i}"} for i in range(1, 4)]
+            )
+        try:
+            items = await async_db.fetch_all(
+                select(TBL_Item).where(TBL_Item.item_id.in_([1, 3])).order_by(TBL_Item.item_id),
+                convert=lambda row: (row.item_id, row.name),
+            )
+            names = await async_db.fetch_all(select(TBL_Item.name).order_by(TBL_Item.item_id))
+        finally:
+            await async_db.dispose_async_database()
+        return items, names
+
+    items, names = asyncio.run(fetch())
+    assert items == [(1, "item 1"), (3, "item 3")]
+    assert names == ["item 1", "item 2", "item 3"]
+
+
+def test_fetch_courses_shares_fetches_of_reordered_ids(monkeypatch):
+    """Concurrent fetches of the same ids in any order or with duplicates share a single fetch."""
+    calls = []
+
+    def get_catalog_courses(course_id_list=None, course_data_id_list=None):
+        calls.append((course_id_list, course_data_id_list))
+        return []
+
+    monkeypatch.setattr(async_db, "get_catalog_courses", get_catalog_courses)
+
+    async def fetch():
+        return await asyncio.gather(
+            async_db.fetch_courses(course_id_list=[1, 2, 3]),
+            async_db.fetch_courses(course_id_list=[3, 1, 2]),
+            async_db.fetch_courses(course_id_list=[2, 2, 1, 3]),
+            async_db.fetch_courses(course_id_list=[1, 2]),
+        )
+
+    asyncio.run(fetch())
+    assert sorted(map(sorted, (ids for ids, _ in calls))) == [[1, 2], [1, 2, 3]]
@@ -0,0 +1,33 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Authentication tests."""
+
+from types import SimpleNamespace
+
+from app import auth
+
+
+def test_is_admin_allowlist(monkeypatch):
+    """Only users allowlisted by username are admins, nobody is without an allowlist."""
+    alice, bob = SimpleNamespace(username="alice"), SimpleNamespace(username="bob")
+
+    monkeypatch.delenv("ADMIN_USERNAMES", raising=False)
+    assert not auth.is_admin(alice)
+
+    monkeypatch.setenv("ADMIN_USERNAMES", " alice, carol ,")
+    assert auth.is_admin(alice)
+    assert not auth.is_admin(bob)
+    assert not auth.is_admin(None)
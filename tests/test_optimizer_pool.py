@@ -0,0 +1,45 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Optimizer process pool tests."""
+
+import time
+
+from app import optimizer_pool
+
+__run_job = vars(optimizer_pool)["__run_job"]
+
+
+def __budget(deadline_ms: int | None = None) -> int | None:
+    return deadline_ms
+
+
+def test_job_budget_capped_at_request_time_left():
+    """Jobs taking a deadline_ms stop by themselves at the latest when the request times out."""
+    expires_at = time.time() + 2
+    status, budget = __run_job(__budget, {"deadline_ms": None}, expires_at)
+    assert status == "ok" and 0 < budget <= 2000
+    assert __run_job(__budget, {"deadline_ms": 50}, expires_at) == ("ok", 50)
+    status, budget = __run_job(__budget, {"deadline_ms": 60_000}, expires_at)
+    assert status == "ok" and budget <= 2000
+    assert __run_job(__budget, {}, expires_at) == ("ok", None)
+
+
+def test_job_expired_while_queued():
+    """A job starting after its request timed out isn't run at all."""
+    calls = []
+    outcome = __run_job(lambda: calls.append(1), {}, time.time() - 1)
+    assert outcome[:2] == ("http", optimizer_pool.API_503_OPTIMIZER_TIMEOUT.status_code)
+    assert not calls
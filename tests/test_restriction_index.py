@@ -0,0 +1,69 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compiled restriction index tests."""
+
+import pytest
+from fastapi import HTTPException
+
+from app import restriction_index, schedule_optimizer
+from benchmarks.optimizer_benchmark import SyntheticCriteria, synthetic_catalog
+
+RESTRICTIONS = {"Must be enrolled in one of the following Majors:": ["Computer Science"]}
+
+
+@pytest.fixture
+def fresh_intern_table():
+    """Empty intern table and compiled cache, as in a fresh optimizer pool worker."""
+    state = vars(restriction_index)
+    saved = dict(state["__VALUE_BITS"]), state["__COMPILED_CACHE"].copy()
+    state["__VALUE_BITS"].clear()
+    state["__COMPILED_CACHE"].clear()
+    yield
+    state["__VALUE_BITS"].clear()
+    state["__VALUE_BITS"].update(saved[0])
+    state["__COMPILED_CACHE"].clear()
+    state["__COMPILED_CACHE"].update(saved[1])
+
+
+def __restricted_catalog() -> list:
+    options = synthetic_catalog(
+        courses=2, sections_per_course=2, meetings_per_section=1, conflict_density=0.05, seed=0
+    )
+    return [course.copy(update={"restrictions": RESTRICTIONS}) for course in options]
+
+
+def test_restrictions_met_on_fresh_intern_table(fresh_intern_table):
+    """Met values first seen in a request are matched on the first request of a process."""
+    options = __restricted_catalog()
+    result = schedule_optimizer.course_level_optimizer(
+        options=options,
+        criteria=SyntheticCriteria.construct(),
+        ensure_restrictions_met=True,
+        restrictions_met=RESTRICTIONS,
+    )
+    assert len(result["crns"]) == len({c.get_comp_key() for c in options})
+
+
+def test_unmet_restrictions_filtered(fresh_intern_table):
+    options = __restricted_catalog()
+    with pytest.raises(HTTPException) as e:
+        schedule_optimizer.course_level_optimizer(
+            options=options,
+            criteria=SyntheticCriteria.construct(),
+            ensure_restrictions_met=True,
+            restrictions_met={next(iter(RESTRICTIONS)): ["Biology"]},
+        )
+    assert e.value is schedule_optimizer.API_404_RESTRICTION_CONFLICT
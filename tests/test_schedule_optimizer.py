@@ -0,0 +1,88 @@
+# Copyright (C) 2022-2023 EZCampus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Schedule optimizer tests."""
+
+from datetime import time
+
+from fastapi import HTTPException
+
+from py_core.classes.course_class import Course
+from py_core.classes.optimizer_criteria_class import CourseOptimizerCriteria
+
+from app import schedule_optimizer
+from benchmarks.optimizer_benchmark import TERM_END, TERM_START, SyntheticCriteria
+
+
+def __optimize(options, criteria, **kwargs) -> dict | None:
+    try:
+        return schedule_optimizer.course_level_optimizer(
+            options=list(options), criteria=criteria, **kwargs
+        )
+    except HTTPException:
+        return None
+
+
+class SeatCriteria(CourseOptimizerCriteria):
+    """Optimizer criteria rating each section by its available seats."""
+
+    def course_eval(self, course: Course) -> float:
+        return float(course.available_enrollment)
+
+
+def __section(course_data_id: int, course_id: int, hour: int) -> Course:
+    """Single Monday meeting section from hour:00 to hour:50."""
+    meeting_cls = Course.__fields__["class_time"].type_
+    meeting = {
+        "time_start": time(hour, 0),
+        "time_end": time(hour, 50),
+        "date_start": TERM_START,
+        "date_end": TERM_END,
+        "days_of_week": [True, False, False, False, False, False, False],
+    }
+    return Course.construct(
+        course_data_id=course_data_id,
+        course_id=course_id,
+        crn=course_data_id,
+        course_code=f"TEST{course_id:04d}U",
+        class_type="LEC",
+        available_enrollment=10,
+        restrictions={},
+        class_time=[
+            meeting_cls.construct(
+                **{k: v for k, v in meeting.items() if k in meeting_cls.__fields__}
+            )
+        ],
+    )
+
+
+def test_moved_section_conflicts():
+    """A section moved to a conflicting time (same course_data_id) is never scheduled with the
+    section it now conflicts with."""
+    criteria = SyntheticCriteria.construct()
+    before = __optimize([__section(900_001, 1, 9), __section(900_002, 2, 11)], criteria)
+    assert sorted(before["crns"]) == [900_001, 900_002]
+    moved = __optimize([__section(900_001, 1, 9), __section(900_002, 2, 9)], criteria)
+    assert moved is None
+
+
+def test_edited_section_rated_again():
+    """A section's cached sort key record is not reused once its content changed."""
+    sorted_options_2d = vars(schedule_optimizer)["__sorted_options_2d"]
+    criteria = SeatCriteria.construct()
+    section = __section(900_003, 3, 9)
+    assert sorted_options_2d(options=[section], criteria=criteria)[0][1] == 10
+    refreshed = section.copy(update={"available_enrollment": 0})
+    assert sorted_options_2d(options=[refreshed], criteria=criteria)[0][1] == 0